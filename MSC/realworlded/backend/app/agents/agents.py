@@ -1,75 +1,143 @@
-from typing import Dict, List, Optional, Any
-from google import genai
+from itertools import zip_longest
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 from app.core.config import settings
+from app.agents.llm import generate_content, stream_content
+from app.agents.resilience import CircuitOpenError
+from app.agents.response_cache import response_cache
+from app.core import timing
+from app.core.metrics import EVALUATION_PARSE_FAILURES, record_fallback
+from app.agents.providers import LLMProvider, get_provider
+from app.agents.prompts import PromptBuilder, estimate_tokens, format_context
+import asyncio
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
+def _fallback_reason(error: Exception) -> str:
+    return "circuit_open" if isinstance(error, CircuitOpenError) else "error"
+
+
 class BaseAgent:
     """Base class for all AI agents"""
     
+    # Answer byte-identical prompts from the response cache
+    cache_responses: bool = False
+    
     def __init__(self, role: str, goal: str, backstory: str):
         self.role = role
         self.goal = goal
         self.backstory = backstory
-        # Initialize the new Gemini client
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY) if settings.GEMINI_API_KEY else None
-        
+        self.prompt_builder = PromptBuilder(role, goal, backstory)
+    
+    @property
+    def metrics_label(self) -> str:
+        """Agent label used in metrics"""
+        return type(self).__name__
+    
+    @property
+    def provider(self) -> Optional[LLMProvider]:
+        """Shared LLM provider from the process-wide registry"""
+        return get_provider()
+    
+    @property
+    def use_cache(self) -> bool:
+        return settings.LLM_CACHE_ENABLED and self.cache_responses
+    
     async def generate_response(
         self,
         user_message: str,
         context: Dict[str, Any],
-        chat_history: List[Dict[str, str]] = None
+        chat_history: List[Dict[str, str]] = None,
+        summary: Optional[str] = None
     ) -> str:
         """Generate a response based on user message and context"""
-        if not self.client:
+        if not self.provider:
+            record_fallback(self.metrics_label, "no_provider")
             return self._fallback_response(user_message, context)
         
         try:
-            # Build the system prompt
-            system_prompt = f"""You are {self.role}.
-Goal: {self.goal}
-Backstory: {self.backstory}
-
-Current Context:
-{self._format_context(context)}
-
-Remember to stay in character and help the user achieve their learning goals."""
+            full_prompt = self._build_prompt(user_message, context, chat_history, summary)
+            if self.use_cache:
+                cached = await response_cache.get(self.provider, full_prompt, self.metrics_label)
+                if cached is not None:
+                    return cached
             
-            # Build conversation history
-            conversation = []
-            if chat_history:
-                for msg in chat_history[-10:]:  # Last 10 messages for context
-                    if msg["role"] == "user":
-                        conversation.append(f"User: {msg['content']}")
-                    elif msg["role"] in ["mentor", "client", "evaluator"]:
-                        conversation.append(f"Assistant: {msg['content']}")
-            
-            # Build full prompt
-            full_prompt = system_prompt + "\n\n"
-            if conversation:
-                full_prompt += "\n".join(conversation) + "\n\n"
-            full_prompt += f"User: {user_message}\n\nAssistant:"
-            
-            # Generate response using new SDK
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=full_prompt
-            )
-            return response.text
+            # Generate response without blocking the event loop
+            with timing.phase("llm"):
+                response = await generate_content(self.provider, full_prompt, agent=self.metrics_label)
+            if self.use_cache:
+                response_cache.put(self.provider, full_prompt, response)
+            return response
             
         except Exception as e:
             logger.error(f"Error generating response from {self.role}: {str(e)}")
+            record_fallback(self.metrics_label, _fallback_reason(e))
             return self._fallback_response(user_message, context)
     
+    async def stream_response(
+        self,
+        user_message: str,
+        context: Dict[str, Any],
+        chat_history: List[Dict[str, str]] = None,
+        summary: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream a response chunk by chunk as the model generates it.
+        
+        Errors raised after the first chunk propagate to the caller so it can
+        tell a cut-off stream from a complete one.
+        """
+        if not self.provider:
+            record_fallback(self.metrics_label, "no_provider")
+            yield self._fallback_response(user_message, context)
+            return
+        
+        full_prompt = self._build_prompt(user_message, context, chat_history, summary)
+        if self.use_cache:
+            cached = await response_cache.get(self.provider, full_prompt, self.metrics_label)
+            if cached is not None:
+                yield cached
+                return
+        
+        chunks: List[str] = []
+        start = time.perf_counter()
+        try:
+            async for chunk in stream_content(self.provider, full_prompt, agent=self.metrics_label):
+                if not chunks:
+                    timing.record("llm_first_chunk", time.perf_counter() - start)
+                chunks.append(chunk)
+                yield chunk
+            timing.record("llm", time.perf_counter() - start)
+            if self.use_cache:
+                response_cache.put(self.provider, full_prompt, "".join(chunks))
+        except Exception as e:
+            logger.error(f"Error streaming response from {self.role}: {str(e)}")
+            if chunks:
+                raise
+            record_fallback(self.metrics_label, _fallback_reason(e))
+            yield self._fallback_response(user_message, context)
+    
+    def _build_prompt(
+        self,
+        user_message: str,
+        context: Dict[str, Any],
+        chat_history: List[Dict[str, str]] = None,
+        summary: Optional[str] = None
+    ) -> str:
+        """Build the full prompt from system prompt, history and user message"""
+        with timing.phase("prompt"):
+            prompt = self.prompt_builder.build(user_message, context, chat_history, summary)
+        logger.info(
+            f"{self.role} prompt: ~{prompt.estimated_tokens} tokens, "
+            f"{prompt.history_used} history messages kept, {prompt.history_dropped} dropped"
+        )
+        return prompt.text
+    
     def _format_context(self, context: Dict[str, Any]) -> str:
         """Format context dictionary into readable string"""
-        formatted = []
-        for key, value in context.items():
-            if value:
-                formatted.append(f"- {key.replace('_', ' ').title()}: {value}")
-        return "\n".join(formatted) if formatted else "No additional context"
+        return format_context(context)
     
     def _fallback_response(self, user_message: str, context: Dict[str, Any]) -> str:
         """Fallback response when LLM is not available"""
@@ -79,6 +147,8 @@ Remember to stay in character and help the user achieve their learning goals."""
 class MentorAgent(BaseAgent):
     """AI Mentor that guides and teaches users"""
     
+    cache_responses = True
+    
     def __init__(self):
         super().__init__(
             role="AI Mentor",
@@ -161,23 +231,74 @@ class EvaluatorAgent(BaseAgent):
             backstory="You are an experienced evaluator who has assessed thousands of professionals. You provide fair, detailed, and actionable feedback that helps people improve. You measure technical skills, communication ability, creativity, and business acumen."
         )
     
+    @property
+    def cache_responses(self) -> bool:
+        return settings.LLM_CACHE_EVALUATIONS
+    
     async def evaluate_session(
         self,
         messages: List[Dict[str, str]],
         context: Dict[str, Any]
     ) -> Dict[str, Any]:
-        """Evaluate an entire session and generate scores"""
+        """Evaluate an entire session and generate scores.
+        
+        Transcripts longer than one evaluation chunk are split into windows
+        that are scored concurrently (at most ``EVALUATION_CHUNK_CONCURRENCY``
+        at a time) and merged (map-reduce), so wall-clock time follows the
+        biggest chunk rather than the whole transcript.
+        """
         mode = context.get("mode", "education")
         
-        if not self.client:
+        if not self.provider:
+            record_fallback(self.metrics_label, "no_provider")
             return self._fallback_evaluation(mode)
         
+        chunks = self._chunk_messages(messages) if settings.EVALUATION_MAP_REDUCE else [messages]
+        if len(chunks) <= 1:
+            evaluation = await self._evaluate_chunk(messages, context)
+            if evaluation is None:
+                record_fallback(self.metrics_label, "error")
+                return self._fallback_evaluation(mode)
+            return evaluation
+        
+        # Keep one long transcript from taking every LLM slot
+        semaphore = asyncio.Semaphore(settings.EVALUATION_CHUNK_CONCURRENCY)
+        
+        async def evaluate(i: int, chunk: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self._evaluate_chunk(chunk, context, part=(i + 1, len(chunks)))
+        
+        results = await asyncio.gather(*(evaluate(i, chunk) for i, chunk in enumerate(chunks)))
+        scored = [
+            (evaluation, sum(1 for msg in chunk if msg.get("role") == "user"))
+            for evaluation, chunk in zip(results, chunks)
+            if evaluation is not None
+        ]
+        if not scored:
+            record_fallback(self.metrics_label, "error")
+            return self._fallback_evaluation(mode)
+        
+        logger.info(f"Evaluated {len(chunks)} transcript chunks ({len(scored)} scored)")
+        return self._merge_evaluations(scored, mode)
+    
+    async def _evaluate_chunk(
+        self,
+        messages: List[Dict[str, str]],
+        context: Dict[str, Any],
+        part: Optional[Tuple[int, int]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Score one transcript window; returns None if the model fails"""
+        mode = context.get("mode", "education")
+        excerpt_note = ""
+        if part:
+            excerpt_note = f"\nThis is part {part[0]} of {part[1]} of a longer conversation. Evaluate only this part.\n"
+        
         try:
             evaluation_prompt = f"""Analyze this conversation and evaluate the user's performance.
 
 Mode: {mode}
 Context: {self._format_context(context)}
-
+{excerpt_note}
 Conversation:
 {self._format_messages(messages)}
 
@@ -203,25 +324,98 @@ Format your response as JSON:
     "detailed_feedback": "paragraph of feedback"
 }}"""
             
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=evaluation_prompt
-            )
-            result_text = response.text
-            
-            # Try to parse JSON response
-            import json
-            try:
-                evaluation = json.loads(result_text)
-            except:
-                # If not valid JSON, create structured response
-                evaluation = self._fallback_evaluation(mode)
+            if self.use_cache:
+                cached = await response_cache.get(self.provider, evaluation_prompt, self.metrics_label)
+                if cached is not None:
+                    return self._parse_evaluation(cached)
             
+            with timing.phase("llm"):
+                result_text = await generate_content(self.provider, evaluation_prompt, agent=self.metrics_label)
+            evaluation = self._parse_evaluation(result_text)
+            # Don't keep serving a reply that couldn't be parsed
+            if evaluation is not None and self.use_cache:
+                response_cache.put(self.provider, evaluation_prompt, result_text)
             return evaluation
             
         except Exception as e:
             logger.error(f"Error in evaluation: {str(e)}")
-            return self._fallback_evaluation(mode)
+            return None
+    
+    def _parse_evaluation(self, result_text: str) -> Optional[Dict[str, Any]]:
+        """Parse the model's JSON reply, tolerating Markdown code fences"""
+        text = result_text.strip()
+        if text.startswith("```"):
+            text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+        try:
+            evaluation = json.loads(text)
+        except ValueError:
+            evaluation = None
+        if not isinstance(evaluation, dict):
+            EVALUATION_PARSE_FAILURES.inc()
+            return None
+        return evaluation
+    
+    def _chunk_messages(self, messages: List[Dict[str, str]]) -> List[List[Dict[str, str]]]:
+        """Split a transcript into windows of at most EVALUATION_CHUNK_TOKENS"""
+        limit = settings.EVALUATION_CHUNK_TOKENS
+        chunks: List[List[Dict[str, str]]] = []
+        current: List[Dict[str, str]] = []
+        size = 0
+        for msg in messages:
+            content = msg.get("content", "")
+            if estimate_tokens(content) > limit:
+                # A single oversized message is cut down to fit one window
+                msg = {**msg, "content": content[:limit * 4]}
+            cost = estimate_tokens(msg.get("content", "")) + 2
+            if current and size + cost > limit:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(msg)
+            size += cost
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    def _merge_evaluations(self, scored: List[Tuple[Dict[str, Any], int]], mode: str) -> Dict[str, Any]:
+        """Reduce per-window evaluations into one report-shaped result.
+        
+        Scores are averaged weighted by the number of user messages in each
+        window; strengths and improvements are de-duplicated and picked
+        round-robin across windows. Fields no window provided are taken from
+        the fallback evaluation.
+        """
+        fallback = self._fallback_evaluation(mode)
+        merged: Dict[str, Any] = {}
+        for key in ("technical_score", "communication_score", "creativity_score", "overall_score"):
+            values = []
+            for evaluation, weight in scored:
+                try:
+                    values.append((float(evaluation[key]), max(weight, 1)))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            if values:
+                total = sum(w for _, w in values)
+                merged[key] = round(sum(v * w for v, w in values) / total, 1)
+            else:
+                merged[key] = fallback[key]
+        
+        for key in ("strengths", "improvements"):
+            lists = [evaluation.get(key) or [] for evaluation, _ in scored]
+            picked: List[str] = []
+            seen = set()
+            for row in zip_longest(*lists):
+                for item in row:
+                    if isinstance(item, str) and item.strip().lower() not in seen:
+                        seen.add(item.strip().lower())
+                        picked.append(item)
+            merged[key] = picked[:3] or fallback[key]
+        
+        merged["detailed_feedback"] = " ".join(
+            evaluation["detailed_feedback"] for evaluation, _ in scored
+            if isinstance(evaluation.get("detailed_feedback"), str)
+        ) or fallback["detailed_feedback"]
+        merged["chunks"] = len(scored)
+        return merged
     
     def _format_messages(self, messages: List[Dict[str, str]]) -> str:
         """Format messages for evaluation"""
@@ -275,14 +469,24 @@ Format your response as JSON:
 class ScenarioGenerator:
     """Generates dynamic real-world scenarios"""
     
-    def __init__(self):
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY) if settings.GEMINI_API_KEY else None
+    @property
+    def provider(self) -> Optional[LLMProvider]:
+        """Shared LLM provider from the process-wide registry"""
+        return get_provider()
     
-    async def generate_scenario(self, context: Dict[str, Any]) -> str:
-        """Generate a realistic scenario based on context"""
+    async def generate_scenario(self, context: Dict[str, Any], fallback: bool = True) -> Optional[str]:
+        """Generate a realistic scenario based on context.
+        
+        With ``fallback=False`` returns None instead of a canned scenario
+        when the model is unavailable, for callers that generate ahead of
+        time and would rather not store one.
+        """
         mode = context.get("mode", "education")
         
-        if not self.client:
+        if not self.provider:
+            if not fallback:
+                return None
+            record_fallback("ScenarioGenerator", "no_provider")
             return self._fallback_scenario(mode, context)
         
         try:
@@ -309,14 +513,14 @@ Generate a challenging but fair question that tests:
 
 Generate just the question from an investor's perspective."""
             
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=prompt
-            )
-            return response.text
+            with timing.phase("llm"):
+                return await generate_content(self.provider, prompt, agent="ScenarioGenerator")
             
         except Exception as e:
             logger.error(f"Error generating scenario: {str(e)}")
+            if not fallback:
+                return None
+            record_fallback("ScenarioGenerator", _fallback_reason(e))
             return self._fallback_scenario(mode, context)
     
     def _fallback_scenario(self, mode: str, context: Dict[str, Any]) -> str:
@@ -325,3 +529,46 @@ Generate just the question from an investor's perspective."""
             return "A client reports that your application crashes when they try to save their work. They're frustrated and need a fix immediately. How would you handle this situation?"
         else:
             return "I'm concerned about your pricing strategy. Your competitors are offering similar products at 30% lower prices. How do you justify your pricing, and what's your plan to compete?"
+
+
+class ConversationSummarizer:
+    """Maintains a compact running summary of older conversation turns"""
+    
+    @property
+    def provider(self) -> Optional[LLMProvider]:
+        """Shared LLM provider from the process-wide registry"""
+        return get_provider()
+    
+    async def summarize(
+        self,
+        previous_summary: Optional[str],
+        messages: List[Dict[str, str]],
+        context: Dict[str, Any]
+    ) -> Optional[str]:
+        """Fold new messages into the previous summary.
+        
+        Returns None when no LLM is available or the call fails, so the
+        caller keeps the previous summary.
+        """
+        if not self.provider:
+            return None
+        
+        try:
+            transcript = "\n".join(
+                f"{msg['role'].upper()}: {msg['content']}" for msg in messages
+            )
+            prompt = f"""You maintain a running summary of a {context.get('mode', 'education')} mode coaching conversation.
+
+Existing summary:
+{previous_summary or "(none yet)"}
+
+New messages:
+{transcript}
+
+Update the summary to include the new messages. Keep every fact the assistant will need later: the user's goals, chosen subject or business, project or business idea, decisions made, and open questions. Write at most {settings.SUMMARY_MAX_WORDS} words of plain prose."""
+            
+            return (await generate_content(self.provider, prompt, agent="ConversationSummarizer")).strip()
+            
+        except Exception as e:
+            logger.error(f"Error summarizing conversation: {str(e)}")
+            return None
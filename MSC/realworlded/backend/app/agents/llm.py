@@ -0,0 +1,221 @@
+"""Non-blocking LLM call layer shared by all agents.
+
+Every model call goes through :func:`generate_content` or
+:func:`stream_content`, which cap the number of in-flight requests per
+process and apply the deadlines, retries, hedging and circuit breaking
+from :mod:`app.agents.resilience`. Providers wrapping a blocking SDK use
+:func:`run_blocking` so the call never runs on the event loop thread.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Optional, Tuple
+
+from app.agents import resilience
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_semaphore: Optional[asyncio.Semaphore] = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Per-process limit on concurrent LLM calls"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Bounded executor for clients that only expose a blocking API"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.LLM_EXECUTOR_WORKERS,
+            thread_name_prefix="llm"
+        )
+    return _executor
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking SDK call on the bounded LLM executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(fn, *args, **kwargs))
+
+
+async def _call(
+    provider: Any,
+    prompt: str,
+    model: Optional[str],
+    agent: str,
+    started: Optional[asyncio.Event] = None
+) -> Tuple[str, float]:
+    """One request under the concurrency limit; returns the text and its duration.
+    
+    The ``LLM_CALL_TIMEOUT`` deadline, the metrics and the duration cover
+    only the provider call, not the wait for a free slot, so a backed-up
+    local queue isn't mistaken for a slow provider. ``started`` is set once
+    the slot is acquired.
+    """
+    async with _get_semaphore():
+        if started is not None:
+            started.set()
+        start = time.perf_counter()
+        try:
+            text = await asyncio.wait_for(provider.generate(prompt, model), settings.LLM_CALL_TIMEOUT)
+        except asyncio.CancelledError:
+            metrics.observe_llm_call(agent, "generate", time.perf_counter() - start, len(prompt), None, cancelled=True)
+            raise
+        except Exception:
+            metrics.observe_llm_call(agent, "generate", time.perf_counter() - start, len(prompt), None)
+            raise
+        elapsed = time.perf_counter() - start
+        metrics.observe_llm_call(agent, "generate", elapsed, len(prompt), len(text))
+        return text, elapsed
+
+
+async def _hedged_call(provider: Any, prompt: str, model: Optional[str], agent: str) -> Tuple[str, float]:
+    """One attempt, plus a second request if the first outlasts the recent p95"""
+    delay = resilience.get_latency_tracker(provider.name).p95() if settings.LLM_HEDGE_ENABLED else None
+    if delay is None:
+        return await _call(provider, prompt, model, agent)
+    
+    started = asyncio.Event()
+    tasks = {asyncio.ensure_future(_call(provider, prompt, model, agent, started))}
+    # The hedge delay counts from when the first request reaches the provider
+    waiter = asyncio.ensure_future(started.wait())
+    try:
+        await asyncio.wait({waiter, *tasks}, return_when=asyncio.FIRST_COMPLETED)
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and resilience.retry_budget.try_spend():
+            metrics.LLM_HEDGES.labels(agent).inc()
+            tasks.add(asyncio.ensure_future(_call(provider, prompt, model, agent)))
+        error: Optional[BaseException] = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        waiter.cancel()
+        for task in tasks:
+            task.cancel()
+
+
+def _may_retry(attempt: int) -> bool:
+    return attempt < settings.LLM_MAX_RETRIES and resilience.retry_budget.try_spend()
+
+
+async def generate_content(
+    provider: Any,
+    prompt: str,
+    model: Optional[str] = None,
+    agent: str = "unknown"
+) -> str:
+    """Generate a completion through ``provider`` under the concurrency limit.
+    
+    Each request has an ``LLM_CALL_TIMEOUT`` deadline that starts once it
+    holds a concurrency slot; failures are retried with jittered backoff
+    while the retry budget allows, and raise
+    :class:`~app.agents.resilience.CircuitOpenError` right away while the
+    provider's circuit is open.
+    """
+    breaker = resilience.get_breaker(provider.name)
+    resilience.retry_budget.record_call()
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            text, elapsed = await _hedged_call(provider, prompt, model, agent)
+        except asyncio.CancelledError:
+            breaker.abandon()
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            if not _may_retry(attempt):
+                raise
+            attempt += 1
+            metrics.LLM_RETRIES.labels(agent).inc()
+            logger.warning(f"LLM call for {agent} failed ({type(e).__name__}), retry {attempt}")
+            await asyncio.sleep(resilience.backoff(attempt))
+            continue
+        
+        breaker.record_success()
+        resilience.get_latency_tracker(provider.name).observe(elapsed)
+        return text
+
+
+async def stream_content(
+    provider: Any,
+    prompt: str,
+    model: Optional[str] = None,
+    agent: str = "unknown"
+) -> AsyncIterator[str]:
+    """Yield completion text chunks as the provider produces them.
+    
+    ``LLM_CALL_TIMEOUT`` bounds the wait for each chunk. A stream that fails
+    before its first chunk is retried like :func:`generate_content`; once
+    text has been yielded, errors propagate.
+    """
+    breaker = resilience.get_breaker(provider.name)
+    resilience.retry_budget.record_call()
+    attempt = 0
+    while True:
+        breaker.before_call()
+        async with _get_semaphore():
+            start = time.perf_counter()
+            size = 0
+            complete = False
+            failed = False
+            stream = provider.stream(prompt, model).__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), settings.LLM_CALL_TIMEOUT)
+                    except StopAsyncIteration:
+                        break
+                    if not size:
+                        metrics.LLM_FIRST_CHUNK_SECONDS.labels(agent).observe(time.perf_counter() - start)
+                    size += len(chunk)
+                    yield chunk
+                complete = True
+            except Exception as e:
+                breaker.record_failure()
+                failed = True
+                if size or not _may_retry(attempt):
+                    raise
+                logger.warning(f"LLM stream for {agent} failed ({type(e).__name__}), retry {attempt + 1}")
+            finally:
+                # Cancelled, or the consumer stopped iterating (GeneratorExit)
+                abandoned = not (complete or failed)
+                if abandoned:
+                    breaker.abandon()
+                metrics.observe_llm_call(
+                    agent, "stream", time.perf_counter() - start, len(prompt),
+                    size if complete else None, cancelled=abandoned
+                )
+                aclose = getattr(stream, "aclose", None)
+                if aclose is not None and not complete:
+                    await aclose()
+        
+        if complete:
+            breaker.record_success()
+            return
+        attempt += 1
+        metrics.LLM_RETRIES.labels(agent).inc()
+        await asyncio.sleep(resilience.backoff(attempt))
+
+
+def shutdown() -> None:
+    """Release the executor threads (called on application shutdown)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
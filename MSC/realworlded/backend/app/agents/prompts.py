@@ -0,0 +1,120 @@
+"""Token-budget-aware prompt builder for the conversational agents.
+
+Each agent's static role/goal/backstory block is compiled once, and the
+per-session context block is cached until the session fields it is built
+from change. Whatever budget is left after the fixed parts is filled with
+the most recent history.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Roles whose messages are replayed as assistant turns
+ASSISTANT_ROLES = ("mentor", "client", "evaluator")
+
+TRUNCATION_MARKER = "[...]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def format_context(context: Dict[str, Any]) -> str:
+    """Format context dictionary into readable string"""
+    formatted = []
+    for key, value in context.items():
+        if value:
+            formatted.append(f"- {key.replace('_', ' ').title()}: {value}")
+    return "\n".join(formatted) if formatted else "No additional context"
+
+
+@lru_cache(maxsize=settings.PROMPT_CONTEXT_CACHE_SIZE)
+def _context_block(items: Tuple[Tuple[str, Any], ...]) -> str:
+    return f"""Current Context:
+{format_context(dict(items))}
+
+Remember to stay in character and help the user achieve their learning goals."""
+
+
+@dataclass
+class BuiltPrompt:
+    """A rendered prompt plus its size, for logging and metrics"""
+    text: str
+    estimated_tokens: int
+    history_used: int
+    history_dropped: int
+
+
+class PromptBuilder:
+    """Builds an agent's prompt within a token budget"""
+
+    def __init__(self, role: str, goal: str, backstory: str):
+        self.header = f"""You are {role}.
+Goal: {goal}
+Backstory: {backstory}
+
+"""
+        self.header_tokens = estimate_tokens(self.header)
+
+    def build(
+        self,
+        user_message: str,
+        context: Dict[str, Any],
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        summary: Optional[str] = None,
+        budget: Optional[int] = None
+    ) -> BuiltPrompt:
+        """Render the prompt, keeping as much recent history as fits"""
+        budget = budget or settings.PROMPT_TOKEN_BUDGET
+        context_block = _context_block(tuple(context.items())) + "\n\n"
+        summary_block = f"Summary of the earlier conversation:\n{summary}\n\n" if summary else ""
+        tail = f"User: {user_message}\n\nAssistant:"
+
+        fixed_tokens = (
+            self.header_tokens
+            + estimate_tokens(context_block)
+            + estimate_tokens(summary_block)
+            + estimate_tokens(tail)
+        )
+        remaining = budget - fixed_tokens
+
+        history = list(chat_history or [])
+        if history and history[-1]["role"] == "user" and history[-1]["content"] == user_message:
+            # The current message is already in the tail
+            history.pop()
+
+        # Walk history newest first, stopping once the budget is spent
+        turns = [
+            f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
+            for msg in history
+            if msg["role"] == "user" or msg["role"] in ASSISTANT_ROLES
+        ]
+        kept: List[str] = []
+        for turn in reversed(turns):
+            cost = estimate_tokens(turn) + 1
+            if cost <= remaining:
+                kept.append(turn)
+                remaining -= cost
+                continue
+            if not kept and remaining > estimate_tokens(TRUNCATION_MARKER) + 1:
+                # Keep the tail of an oversized latest turn rather than nothing
+                chars = (remaining - estimate_tokens(TRUNCATION_MARKER) - 1) * 4
+                kept.append(f"{TRUNCATION_MARKER}{turn[-chars:]}")
+                remaining = 0
+            break
+        kept.reverse()
+
+        text = self.header + context_block + summary_block
+        if kept:
+            text += "\n".join(kept) + "\n\n"
+        text += tail
+
+        return BuiltPrompt(
+            text=text,
+            estimated_tokens=estimate_tokens(text),
+            history_used=len(kept),
+            history_dropped=len(turns) - len(kept)
+        )
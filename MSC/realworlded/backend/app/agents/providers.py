@@ -0,0 +1,225 @@
+"""Process-wide LLM provider registry.
+
+Each backend is created once per process and shared by every agent, so all
+model traffic reuses a single pooled keep-alive client. ``LLM_PROVIDER``
+selects the active backend; ``"fake"`` swaps in a local deterministic
+stand-in for tests and load benchmarks.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.agents.llm import run_blocking
+
+
+class LLMProvider(ABC):
+    """Interface every LLM backend implements"""
+
+    name: str = "base"
+
+    @property
+    def default_model(self) -> str:
+        """Model used when a call doesn't name one"""
+        return ""
+
+    @abstractmethod
+    async def generate(self, prompt: str, model: Optional[str] = None) -> str:
+        """Return the full completion for a prompt"""
+
+    async def stream(self, prompt: str, model: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield completion chunks; defaults to a single chunk"""
+        yield await self.generate(prompt, model)
+
+    async def aclose(self) -> None:
+        """Release network resources held by the provider"""
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini backend sharing one ``genai.Client`` per process"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str):
+        from google import genai
+
+        self.client = genai.Client(api_key=api_key)
+
+    @property
+    def default_model(self) -> str:
+        return settings.GEMINI_MODEL
+
+    async def generate(self, prompt: str, model: Optional[str] = None) -> str:
+        model = model or settings.GEMINI_MODEL
+        aio = getattr(self.client, "aio", None)
+        if aio is not None:
+            response = await aio.models.generate_content(model=model, contents=prompt)
+        else:
+            response = await run_blocking(
+                self.client.models.generate_content, model=model, contents=prompt
+            )
+        return response.text
+
+    async def stream(self, prompt: str, model: Optional[str] = None) -> AsyncIterator[str]:
+        model = model or settings.GEMINI_MODEL
+        aio = getattr(self.client, "aio", None)
+        if aio is None or not hasattr(aio.models, "generate_content_stream"):
+            yield await self.generate(prompt, model)
+            return
+
+        stream = await aio.models.generate_content_stream(model=model, contents=prompt)
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+    async def aclose(self) -> None:
+        close = getattr(getattr(self.client, "aio", None), "aclose", None)
+        if close is not None:
+            await close()
+
+
+class FakeProviderError(RuntimeError):
+    """Injected failure from :class:`FakeProvider`"""
+
+
+class FakeProvider(LLMProvider):
+    """Deterministic local stand-in with configurable latency and length.
+
+    The same prompt always produces the same text, so tests can assert on
+    it; ``latency`` models time-to-first-token and ``token_delay`` the gap
+    between streamed tokens. For load tests the latency can instead be
+    drawn from a distribution with that mean (``uniform``, ``exponential``
+    or ``lognormal``), and a ``failure_rate`` share of calls raise
+    :class:`FakeProviderError` (streams fail at a random token). Prompts
+    asking for the evaluator's JSON get a well-formed evaluation, so
+    benchmarks exercise the evaluation path rather than its fallback.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        tokens: int = 40,
+        token_delay: float = 0.01,
+        latency_dist: str = "fixed",
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        if latency_dist not in ("fixed", "uniform", "exponential", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {latency_dist}")
+        self.latency = latency
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.latency_dist = latency_dist
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    def _tokens(self, prompt: str) -> list:
+        digest = hashlib.sha256(prompt.encode()).hexdigest()
+        return [f"{digest[i % 32:i % 32 + 6]} " for i in range(self.tokens)]
+
+    def _evaluation(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode()).digest()
+        scores = [5 + digest[i] % 5 for i in range(4)]
+        return json.dumps({
+            "technical_score": scores[0],
+            "communication_score": scores[1],
+            "creativity_score": scores[2],
+            "overall_score": scores[3],
+            "strengths": [f"Strength {digest[i] % 10}" for i in range(4, 7)],
+            "improvements": [f"Improvement {digest[i] % 10}" for i in range(7, 10)],
+            "detailed_feedback": "".join(self._tokens(prompt)).rstrip()
+        })
+
+    def _sample_latency(self) -> float:
+        if self.latency <= 0 or self.latency_dist == "fixed":
+            return self.latency
+        if self.latency_dist == "uniform":
+            return self._random.uniform(0, 2 * self.latency)
+        if self.latency_dist == "exponential":
+            return self._random.expovariate(1 / self.latency)
+        # Lognormal with the configured mean and a long right tail
+        sigma = 0.75
+        return self._random.lognormvariate(math.log(self.latency) - sigma ** 2 / 2, sigma)
+
+    def _fails(self) -> bool:
+        return self.failure_rate > 0 and self._random.random() < self.failure_rate
+
+    async def generate(self, prompt: str, model: Optional[str] = None) -> str:
+        await asyncio.sleep(self._sample_latency() + self.token_delay * self.tokens)
+        if self._fails():
+            raise FakeProviderError("Injected fake LLM failure")
+        if '"technical_score"' in prompt:
+            return self._evaluation(prompt)
+        return "".join(self._tokens(prompt)).rstrip()
+
+    async def stream(self, prompt: str, model: Optional[str] = None) -> AsyncIterator[str]:
+        fail_at = self._random.randrange(self.tokens + 1) if self._fails() else None
+        await asyncio.sleep(self._sample_latency())
+        for i, token in enumerate(self._tokens(prompt)):
+            if i == fail_at:
+                raise FakeProviderError("Injected fake LLM failure")
+            yield token
+            await asyncio.sleep(self.token_delay)
+        if fail_at == self.tokens:
+            raise FakeProviderError("Injected fake LLM failure")
+
+
+def _create_gemini() -> Optional[LLMProvider]:
+    # Without an API key agents run on their canned fallback responses
+    return GeminiProvider(settings.GEMINI_API_KEY) if settings.GEMINI_API_KEY else None
+
+
+def _create_fake() -> Optional[LLMProvider]:
+    return FakeProvider(
+        latency=settings.FAKE_LLM_LATENCY,
+        tokens=settings.FAKE_LLM_TOKENS,
+        token_delay=settings.FAKE_LLM_TOKEN_DELAY,
+        latency_dist=settings.FAKE_LLM_LATENCY_DIST,
+        failure_rate=settings.FAKE_LLM_FAILURE_RATE,
+        seed=settings.FAKE_LLM_SEED
+    )
+
+
+_factories: Dict[str, Callable[[], Optional[LLMProvider]]] = {
+    "gemini": _create_gemini,
+    "fake": _create_fake,
+}
+_providers: Dict[str, Optional[LLMProvider]] = {}
+
+
+def register_provider(name: str, factory: Callable[[], Optional[LLMProvider]]) -> None:
+    """Register (or replace) a backend factory under ``name``"""
+    _factories[name] = factory
+    _providers.pop(name, None)
+
+
+def set_provider(name: str, provider: Optional[LLMProvider]) -> None:
+    """Install a ready-made provider instance, e.g. from a test"""
+    _providers[name] = provider
+
+
+def get_provider(name: Optional[str] = None) -> Optional[LLMProvider]:
+    """Return the shared provider for ``name`` (defaults to ``LLM_PROVIDER``).
+
+    Returns ``None`` when the backend is not configured.
+    """
+    name = name or settings.LLM_PROVIDER
+    if name not in _providers:
+        if name not in _factories:
+            raise ValueError(f"Unknown LLM provider: {name}")
+        _providers[name] = _factories[name]()
+    return _providers[name]
+
+
+async def close_providers() -> None:
+    """Close every instantiated provider (called on application shutdown)"""
+    for provider in list(_providers.values()):
+        if provider is not None:
+            await provider.aclose()
+    _providers.clear()
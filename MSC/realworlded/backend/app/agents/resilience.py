@@ -0,0 +1,178 @@
+"""Failure handling for LLM calls: circuit breaker, retry budget, hedging.
+
+- :class:`CircuitBreaker` opens after ``LLM_BREAKER_FAILURES`` consecutive
+  failures. While open, calls fail immediately with
+  :class:`CircuitOpenError` so agents serve their fallback output at once.
+  After ``LLM_BREAKER_RESET`` seconds a single probe call is let through
+  (half-open); its outcome closes or re-opens the circuit. A probe that
+  neither succeeds nor fails within ``LLM_CALL_TIMEOUT`` (or whose caller
+  went away) no longer blocks the next one.
+- :class:`RetryBudget` caps retries (and hedged requests) at a fraction of
+  recent calls, plus a small per-second floor, so retries can't multiply
+  load on a struggling backend.
+- :class:`LatencyTracker` keeps recent successful call latencies; its p95
+  is the delay after which a hedged second request is sent.
+"""
+import random
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, probe_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.rejected = 0
+        self._probe_started: Optional[float] = None
+
+    def before_call(self) -> None:
+        """Raise :class:`CircuitOpenError` unless a call may proceed"""
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit for {self.name} is open")
+            self.state = self.HALF_OPEN
+            self._probe_started = None
+        if self.state == self.HALF_OPEN:
+            # A probe that outlived its deadline is presumed lost
+            if self._probe_started is not None and now - self._probe_started < self.probe_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit for {self.name} is half-open")
+            self._probe_started = now
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_started = None
+
+    def abandon(self) -> None:
+        """The caller went away; let another call probe a half-open circuit"""
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_started = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = None
+        if self.state == self.OPEN:
+            retry_in = max(0.0, round(self.reset_timeout - (time.monotonic() - self.opened_at), 1))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "rejected_calls": self.rejected,
+            "retry_in_seconds": retry_in,
+        }
+
+
+class RetryBudget:
+    """Token bucket of retries earned by ordinary calls"""
+
+    def __init__(self, ratio: float, min_per_second: float, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self.updated) * self.min_per_second)
+        self.updated = now
+
+    def record_call(self) -> None:
+        """Credit the budget for one first-attempt call"""
+        self._refill()
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget if available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies"""
+
+    def __init__(self, window: int, min_samples: int):
+        self.samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+        self._p95: Optional[float] = None
+        self._since_update = 0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._since_update += 1
+
+    def p95(self) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        # Re-sorting on every call is wasted work; refresh every few samples
+        if self._p95 is None or self._since_update >= 10:
+            ordered = sorted(self.samples)
+            self._p95 = ordered[int(0.95 * (len(ordered) - 1))]
+            self._since_update = 0
+        return self._p95
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry ``attempt`` (1-based)"""
+    return random.uniform(0, settings.LLM_RETRY_BACKOFF * (2 ** (attempt - 1)))
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+
+retry_budget = RetryBudget(settings.LLM_RETRY_BUDGET_RATIO, settings.LLM_RETRY_BUDGET_MIN_PER_SECOND)
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(
+            name, settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_RESET, settings.LLM_CALL_TIMEOUT
+        )
+    return breaker
+
+
+def get_latency_tracker(name: str) -> LatencyTracker:
+    tracker = _latencies.get(name)
+    if tracker is None:
+        tracker = _latencies[name] = LatencyTracker(200, settings.LLM_HEDGE_MIN_SAMPLES)
+    return tracker
+
+
+def snapshot() -> Dict[str, Any]:
+    """State of every breaker and the retry budget, for the status endpoint"""
+    return {
+        "breakers": {name: breaker.snapshot() for name, breaker in _breakers.items()},
+        "retry_budget": {"tokens": round(retry_budget.tokens, 2)},
+        "hedge_after_seconds": {
+            name: tracker.p95() for name, tracker in _latencies.items()
+        } if settings.LLM_HEDGE_ENABLED else None,
+    }
@@ -0,0 +1,186 @@
+"""Exact-match cache of model responses.
+
+Entries are keyed by a hash of the provider, model and the fully built
+prompt, so only byte-identical prompts share a response (typically the
+first turn of sessions with the same settings). Agents opt in with
+``BaseAgent.cache_responses``.
+
+Two tiers:
+
+- an in-process LRU (``LLM_CACHE_MAX_ENTRIES``), and
+- a SQLite file at ``LLM_CACHE_PATH`` shared by every worker on the host,
+  pruned to ``LLM_CACHE_DISK_MAX_ENTRIES`` least recently used entries.
+  It is only touched from one dedicated thread per process, so lookups
+  never block the event loop and stores don't delay the response. Leave
+  the path empty to disable it.
+
+Both tiers expire entries ``LLM_CACHE_TTL`` seconds after they were stored.
+Disk errors are logged and treated as misses.
+"""
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Optional, Tuple
+
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Refresh a disk entry's LRU timestamp at most this often, to spare writes
+_TOUCH_INTERVAL = 60.0
+# Prune the disk tier once per this many stores
+_PRUNE_EVERY = 100
+
+
+def cache_key(provider: Any, prompt: str) -> str:
+    """Hash identifying a prompt sent to a specific provider and model"""
+    digest = hashlib.sha256()
+    digest.update(f"{provider.name}\0{provider.default_model}\0".encode())
+    digest.update(prompt.encode())
+    return digest.hexdigest()
+
+
+def _log_write_error(future: Future) -> None:
+    error = future.exception()
+    if error is not None:
+        logger.warning(f"LLM response cache write failed: {str(error)}")
+
+
+class DiskCache:
+    """SQLite-backed tier shared between processes on one host.
+
+    Blocking; call only from the owning :class:`ResponseCache`'s thread.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stores = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_used_at ON responses (used_at)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """The response and its expiry (wall clock) if stored and fresh"""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT response, expires_at, used_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        response, expires_at, used_at = row
+        now = time.time()
+        if expires_at <= now:
+            return None
+        if now - used_at > _TOUCH_INTERVAL:
+            conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        return response, expires_at
+
+    def set(self, key: str, response: str, ttl: float) -> None:
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, expires_at, used_at) VALUES (?, ?, ?, ?)",
+            (key, response, now + ttl, now)
+        )
+        self._stores += 1
+        if self._stores % _PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self) -> None:
+        """Drop expired entries, then the least recently used beyond the limit"""
+        conn = self._connect()
+        conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        excess = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY used_at LIMIT ?)",
+                (excess,)
+            )
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class ResponseCache:
+    """Memory LRU in front of an optional shared disk tier"""
+
+    def __init__(self, max_entries: int, ttl: float, disk: Optional[DiskCache] = None):
+        self.ttl = ttl
+        self.memory = TTLCache(max_entries, ttl)
+        self.disk = disk
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+        return self._executor
+
+    async def get(self, provider: Any, prompt: str, agent: str) -> Optional[str]:
+        """Cached response for ``prompt``, counting the hit or miss"""
+        key = cache_key(provider, prompt)
+        response = self.memory.get(key)
+        tier = "memory"
+        if response is None and self.disk is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                stored = await loop.run_in_executor(self._get_executor(), self.disk.get, key)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM response cache read failed: {str(e)}")
+                stored = None
+            if stored is not None:
+                response, expires_at = stored
+                tier = "disk"
+                self.memory.set(key, response, ttl=expires_at - time.time())
+        if response is None:
+            metrics.LLM_CACHE_REQUESTS.labels(agent, "miss").inc()
+            return None
+        metrics.LLM_CACHE_REQUESTS.labels(agent, tier).inc()
+        metrics.LLM_CACHE_BYTES_SAVED.labels(agent).inc(len(prompt.encode()) + len(response.encode()))
+        return response
+
+    def put(self, provider: Any, prompt: str, response: str) -> None:
+        """Store a complete, successful response"""
+        if not response:
+            return
+        key = cache_key(provider, prompt)
+        self.memory.set(key, response)
+        if self.disk is not None:
+            self._get_executor().submit(
+                self.disk.set, key, response, self.ttl
+            ).add_done_callback(_log_write_error)
+
+    def close(self) -> None:
+        """Close the disk tier and its thread (called on application shutdown)"""
+        if self._executor is not None:
+            if self.disk is not None:
+                self._executor.submit(self.disk.close)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+response_cache = ResponseCache(
+    settings.LLM_CACHE_MAX_ENTRIES,
+    settings.LLM_CACHE_TTL,
+    DiskCache(settings.LLM_CACHE_PATH, settings.LLM_CACHE_DISK_MAX_ENTRIES) if settings.LLM_CACHE_PATH else None
+)
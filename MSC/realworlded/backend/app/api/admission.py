@@ -0,0 +1,147 @@
+"""Admission control for LLM-backed endpoints.
+
+Each endpoint class (``chat``, ``scenario``, ``evaluation``) has its own
+per-user token bucket; a caller over budget gets ``429`` with
+``Retry-After``. Independently, the process admits at most
+``LLM_MAX_CONCURRENCY + LLM_MAX_QUEUE`` LLM-backed requests at a time;
+beyond that new requests are shed with ``503`` instead of queueing behind
+the model without bound.
+
+Buckets live behind :class:`RateLimitStore` so a shared store (e.g.
+Redis) can replace the in-process one when running several workers.
+"""
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable
+
+from fastapi import Depends, HTTPException, status
+
+from app.api.deps import Principal, get_current_user
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class Budget:
+    """Token bucket parameters: sustained rate and burst size"""
+    per_minute: float
+    burst: int
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60
+
+
+BUDGETS: Dict[str, Budget] = {
+    "chat": Budget(settings.RATE_LIMIT_CHAT_PER_MINUTE, settings.RATE_LIMIT_CHAT_BURST),
+    "scenario": Budget(settings.RATE_LIMIT_SCENARIO_PER_MINUTE, settings.RATE_LIMIT_SCENARIO_BURST),
+    "evaluation": Budget(settings.RATE_LIMIT_EVALUATION_PER_MINUTE, settings.RATE_LIMIT_EVALUATION_BURST),
+}
+
+
+class RateLimitStore(ABC):
+    """Storage for token buckets"""
+
+    @abstractmethod
+    def take(self, key: Hashable, budget: Budget) -> float:
+        """Take one token from ``key``'s bucket.
+
+        Returns 0 if a token was available, otherwise the seconds until
+        one will be.
+        """
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Per-process buckets, evicting the least recently used past ``maxsize``"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def take(self, key: Hashable, budget: Budget) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (budget.burst, now))
+        tokens = min(budget.burst, tokens + (now - updated) * budget.rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / budget.rate if budget.rate > 0 else 60.0
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class Slot:
+    """An admitted request's share of the in-flight LLM capacity"""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._held = True
+
+    def release(self) -> None:
+        if self._held:
+            self._held = False
+            self._controller.in_flight -= 1
+
+    def detach(self) -> "Slot":
+        """Move the slot to a new owner, e.g. a streaming response body.
+
+        The dependency's own release becomes a no-op; the new owner must
+        call :meth:`release`.
+        """
+        self._held = False
+        return Slot(self._controller)
+
+
+class AdmissionController:
+    """Per-user budgets plus a process-wide cap on LLM-backed requests"""
+
+    def __init__(self, store: RateLimitStore, max_in_flight: int):
+        self.store = store
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+    def admit(self, user_id: int, endpoint_class: str) -> Slot:
+        """Admit a request or raise 429/503 with ``Retry-After``"""
+        if self.in_flight >= self.max_in_flight:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": str(settings.LLM_SHED_RETRY_AFTER)}
+            )
+        if settings.RATE_LIMIT_ENABLED:
+            wait = self.store.take((user_id, endpoint_class), BUDGETS[endpoint_class])
+            if wait > 0:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Rate limit exceeded",
+                    headers={"Retry-After": str(math.ceil(wait))}
+                )
+        self.in_flight += 1
+        return Slot(self)
+
+
+admission = AdmissionController(
+    MemoryRateLimitStore(settings.RATE_LIMIT_MAX_KEYS),
+    settings.LLM_MAX_CONCURRENCY + settings.LLM_MAX_QUEUE
+)
+
+
+def admit(endpoint_class: str):
+    """Dependency admitting the current user to an endpoint class"""
+    if endpoint_class not in BUDGETS:
+        raise ValueError(f"Unknown endpoint class: {endpoint_class}")
+
+    async def dependency(current_user: Principal = Depends(get_current_user)):
+        slot = admission.admit(current_user.id, endpoint_class)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    return dependency
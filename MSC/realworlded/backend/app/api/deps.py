@@ -1,21 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+import hashlib
+import math
+import time
 
 from app.db.database import get_db
 from app.models.models import User
+from app.core.cache import TTLCache
+from app.core import timing
+from app.core.config import settings
 from app.core.security import decode_access_token
 
 security = HTTPBearer()
 
 
+@dataclass(frozen=True)
+class Principal:
+    """Lightweight authenticated user, detached from any DB session"""
+    id: int
+    email: str
+    username: str
+    full_name: Optional[str]
+    created_at: datetime
+
+
+# Authenticated principals keyed by (user id, token hash)
+principal_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
+
+def invalidate_principal(user_id: int) -> None:
+    """Forget every cached principal for a user"""
+    principal_cache.invalidate(lambda key: key[0] == user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target: User) -> None:
+    invalidate_principal(target.id)
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Dependency to get current authenticated user"""
-    token = credentials.credentials
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
+    """Dependency to get current authenticated user.
+    
+    Principals are cached for ``AUTH_CACHE_TTL`` seconds (never past the
+    token's expiry), so most requests skip the user lookup.
+    """
+    with timing.phase("auth"):
+        return await _authenticate(credentials.credentials, db)
+
+
+async def authenticate_websocket(
+    websocket: WebSocket,
+    db: AsyncSession
+) -> Optional[Tuple[Principal, float]]:
+    """Authenticate a WebSocket handshake.
+    
+    Browsers can't set headers on WebSocket requests, so the token may come
+    as ``?token=`` as well as a Bearer ``Authorization`` header. Returns the
+    principal and the token's expiry (epoch seconds), or None if invalid.
+    """
+    token = websocket.query_params.get("token")
+    if not token:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    if not token:
+        return None
+    try:
+        principal = await _authenticate(token, db)
+    except HTTPException:
+        return None
+    return principal, decode_access_token(token).get("exp") or math.inf
+
+
+async def _authenticate(token: str, db: AsyncSession) -> Principal:
     payload = decode_access_token(token)
     
     if payload is None:
@@ -33,7 +98,12 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    cache_key = (int(user_id), hashlib.sha256(token.encode()).hexdigest())
+    principal = principal_cache.get(cache_key)
+    if principal is not None:
+        return principal
+    
+    user = await db.get(User, int(user_id))
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -41,4 +111,13 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return user
+    principal = Principal(
+        id=user.id,
+        email=user.email,
+        username=user.username,
+        full_name=user.full_name,
+        created_at=user.created_at
+    )
+    expires_in = payload.get("exp", 0) - time.time()
+    principal_cache.set(cache_key, principal, ttl=expires_in)
+    return principal
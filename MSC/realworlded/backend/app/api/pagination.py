@@ -0,0 +1,106 @@
+"""Keyset (cursor) pagination on ``(created_at, id)``.
+
+List endpoints accept ``limit`` and ``after``. Either one switches the
+response to a :class:`~app.schemas.schemas.Page` with a ``next_cursor``;
+requests with neither keep the legacy plain-list shape, capped at
+``PAGINATION_LEGACY_LIMIT`` rows with the next cursor in the
+``X-Next-Cursor`` header. Lists that legacy clients treat as a log (chat
+messages) pass ``legacy_newest`` to get the newest rows instead, still in
+ascending order and without a cursor.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor for the row a page ended on"""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def _timestamp_param(db: AsyncSession, value: datetime):
+    # SQLite keeps server-side timestamps as "YYYY-MM-DD HH:MM:SS" text while
+    # bound datetimes carry microseconds; normalise so equal times compare equal
+    if db.bind.dialect.name == "sqlite":
+        return func.datetime(value)
+    return value
+
+
+async def paginate(
+    db: AsyncSession,
+    stmt: Select,
+    model: Any,
+    limit: Optional[int],
+    after: Optional[str],
+    descending: bool = False,
+    response: Optional[Response] = None,
+    legacy_newest: bool = False
+) -> Tuple[List[Any], Optional[str]]:
+    """Fetch one page of ``stmt`` ordered by ``(created_at, id)``.
+
+    Returns the rows and the cursor for the next page (None on the last).
+    In legacy mode (no ``limit``/``after``) the cursor is also set as a
+    response header; with ``legacy_newest`` legacy mode returns the newest
+    rows in ascending order and no cursor.
+    """
+    legacy = limit is None and after is None
+    page_size = settings.PAGINATION_LEGACY_LIMIT if legacy else (limit or settings.PAGINATION_DEFAULT_LIMIT)
+
+    if legacy and legacy_newest and not descending:
+        rows = (await db.scalars(
+            stmt.order_by(model.created_at.desc(), model.id.desc()).limit(page_size)
+        )).all()
+        return list(reversed(rows)), None
+
+    if after:
+        created_at, row_id = decode_cursor(after)
+        ts = _timestamp_param(db, created_at)
+        if descending:
+            stmt = stmt.where(or_(
+                model.created_at < ts,
+                and_(model.created_at == ts, model.id < row_id)
+            ))
+        else:
+            stmt = stmt.where(or_(
+                model.created_at > ts,
+                and_(model.created_at == ts, model.id > row_id)
+            ))
+
+    if descending:
+        stmt = stmt.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        stmt = stmt.order_by(model.created_at, model.id)
+
+    # Fetch one extra row to learn whether another page exists
+    rows = (await db.scalars(stmt.limit(page_size + 1))).all()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    if legacy and next_cursor and response is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows, next_cursor
@@ -1,115 +1,122 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import (
+    APIRouter, Depends, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
+)
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from collections import deque
+from typing import Any, Dict, List, Optional, Union
+import anyio
+import asyncio
+import json
+import logging
+import time
 
-from app.db.database import get_db
-from app.models.models import User, Session as SessionModel, Message
-from app.schemas.schemas import ChatRequest, ChatResponse, MessageResponse
-from app.api.deps import get_current_user
-from app.agents.agents import MentorAgent, ClientAgent, ScenarioGenerator
+from app.core.cache import KeyConflictError, SingleFlight
+from app.core import timing
+from app.core.config import settings
+from app.db.database import get_db, AsyncSessionLocal
+from app.models.models import Message
+from app.schemas.schemas import ChatRequest, ChatResponse, MessageResponse, Page
+from app.api.deps import Principal, authenticate_websocket, get_current_user
+from app.api.admission import Slot, admission, admit
+from app.api.pagination import paginate
+from app.agents.agents import MentorAgent, ClientAgent
+from app.services import scenarios, stages, turns, summary as conversation_summary
+from app.services.session_state import SessionSnapshot, session_cache
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=timing.TimedRoute)
 
 # Initialize agents
 mentor_agent = MentorAgent()
 client_agent = ClientAgent()
-scenario_generator = ScenarioGenerator()
+
+# In-flight and just-answered chat turns, for coalescing duplicates
+chat_requests = SingleFlight(settings.CHAT_DEDUP_CACHE_SIZE, settings.CHAT_DEDUP_WINDOW)
 
 
 @router.post("/", response_model=ChatResponse)
 async def send_message(
     chat_data: ChatRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
 ):
-    """Send a message and get AI response"""
+    """Send a message and get AI response.
     
-    # Get session
-    session = db.query(SessionModel).filter(
-        SessionModel.id == chat_data.session_id,
-        SessionModel.user_id == current_user.id
-    ).first()
+    Repeats of a message (same user, session and text, or the same
+    ``Idempotency-Key`` header) share one generation: a repeat sent while
+    the first is in flight waits for it, and one sent within
+    ``CHAT_DEDUP_WINDOW`` seconds after gets the stored reply. Only the
+    first of them is admitted (and charged to the rate limit). Reusing an
+    ``Idempotency-Key`` for a different message is rejected with 422.
+    """
+    message = _normalize_message(chat_data.message)
+    if idempotency_key:
+        key = ("key", current_user.id, idempotency_key)
+        fingerprint = (chat_data.session_id, message)
+    else:
+        key = ("message", current_user.id, chat_data.session_id, message)
+        fingerprint = None
     
-    if not session:
+    async def lead() -> ChatResponse:
+        slot = admission.admit(current_user.id, "chat")
+        try:
+            return await _answer(chat_data, current_user.id)
+        finally:
+            slot.release()
+    
+    try:
+        return await chat_requests.do(key, lead, fingerprint)
+    except KeyConflictError:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different message"
         )
+
+
+async def _answer(chat_data: ChatRequest, user_id: int) -> ChatResponse:
+    """Generate and store one chat turn.
     
-    # Save user message
-    user_message = Message(
-        session_id=session.id,
-        role="user",
-        content=chat_data.message
-    )
-    db.add(user_message)
-    db.commit()
-    
-    # Get chat history
-    chat_history = db.query(Message).filter(
-        Message.session_id == session.id
-    ).order_by(Message.created_at).all()
-    
-    history_dict = [
-        {"role": msg.role, "content": msg.content}
-        for msg in chat_history
-    ]
-    
-    # Prepare context
-    context = {
-        "mode": session.mode,
-        "subject": session.subject,
-        "application": session.application,
-        "project_idea": session.project_idea,
-        "business_type": session.business_type,
-        "location": session.location,
-        "business_idea": session.business_idea,
-        "current_stage": session.current_stage
-    }
-    
-    # Determine which agent to use based on stage
-    if session.current_stage in ["started", "subject_selected", "application_selected", "guidance"]:
-        agent = mentor_agent
-        agent_type = "mentor"
-    elif session.current_stage in ["testing", "simulation"]:
-        agent = client_agent
-        agent_type = "client"
-    else:
-        agent = mentor_agent
-        agent_type = "mentor"
-    
-    # Generate AI response
-    ai_response = await agent.generate_response(
-        chat_data.message,
-        context,
-        history_dict
-    )
+    Uses its own DB session since the work may outlive the request that
+    started it when duplicates are coalesced.
+    """
+    async with AsyncSessionLocal() as db:
+        session = await _get_session(db, chat_data.session_id, user_id)
+        
+        context = session.context
+        agent, agent_type = _select_agent(session.current_stage)
+        session_update = _detect_stage_update(session.mode, session.current_stage, chat_data.message)
+        
+        # Get chat history
+        history_dict = await _load_history(db, session.id)
+        
+        summary = session.summary
+        session_id = session.id
+        
+        # End the read transaction so the pooled connection isn't held while
+        # waiting on the model
+        await db.commit()
+        
+        # Generate AI response
+        ai_response = await agent.generate_response(
+            chat_data.message,
+            context,
+            history_dict,
+            summary
+        )
+        
+        # Save both messages and any stage change in one transaction
+        with timing.phase("persist"):
+            await turns.persist_turn(db, _build_turn(
+                session_id, chat_data.message, ai_response, agent_type, session_update
+            ))
     
-    # Save AI message
-    ai_message = Message(
-        session_id=session.id,
-        role=agent_type,
-        content=ai_response,
-        agent_type=agent_type
-    )
-    db.add(ai_message)
-    db.commit()
-    
-    # Prepare session update info
-    session_update = None
-    
-    # Auto-detect stage transitions
-    user_msg_lower = chat_data.message.lower()
-    if session.mode == "education":
-        if session.current_stage == "started" and any(keyword in user_msg_lower for keyword in ["c++", "java", "python", "javascript"]):
-            session_update = {"current_stage": "subject_selected"}
-        elif "project" in user_msg_lower and "done" in user_msg_lower:
-            session_update = {"current_stage": "testing"}
-    elif session.mode == "business":
-        if session.current_stage == "started" and any(keyword in user_msg_lower for keyword in ["food", "clothing", "tech", "retail"]):
-            session_update = {"current_stage": "business_selected"}
-        elif "ready" in user_msg_lower and "pitch" in user_msg_lower:
-            session_update = {"current_stage": "simulation"}
+    conversation_summary.schedule_refresh(session_id, context)
+    if session_update:
+        scenarios.on_stage_change(session_id, session_update["current_stage"], context)
     
     return ChatResponse(
         message=ai_response,
@@ -118,78 +125,366 @@ async def send_message(
     )
 
 
-@router.get("/{session_id}/messages", response_model=List[MessageResponse])
-def get_session_messages(
-    session_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+def _normalize_message(message: str) -> str:
+    """Fold case and whitespace so trivially different repeats match"""
+    return " ".join(message.split()).casefold()
+
+
+@router.post("/stream")
+async def stream_message(
+    chat_data: ChatRequest,
+    current_user: Principal = Depends(get_current_user),
+    slot: Slot = Depends(admit("chat")),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all messages for a session"""
+    """Send a message and stream the AI response as server-sent events.
+    
+    Emits ``token`` events as text arrives, then a single ``done`` event
+    carrying the agent type and session update. If the model stream fails
+    partway an ``error`` event is sent instead of ``done``. The turn is
+    saved once the stream ends; cut-off responses are saved with
+    ``{"partial": true}`` metadata.
+    """
+    
+    session = await _get_session(db, chat_data.session_id, current_user.id)
+    
+    context = session.context
+    agent, agent_type = _select_agent(session.current_stage)
+    session_update = _detect_stage_update(session.mode, session.current_stage, chat_data.message)
+    history_dict = await _load_history(db, session.id)
+    summary = session.summary
+    session_id = session.id
+    await db.commit()
+    
+    # The admission slot is held until the stream finishes, not just until
+    # this handler returns
+    stream_slot = slot.detach()
+    
+    async def event_stream():
+        chunks: List[str] = []
+        complete = False
+        try:
+            async for chunk in agent.stream_response(chat_data.message, context, history_dict, summary):
+                chunks.append(chunk)
+                yield _sse_event("token", {"text": chunk})
+            complete = True
+            yield _sse_event("done", {
+                "agent_type": agent_type,
+                "session_update": session_update
+            })
+        except asyncio.CancelledError:
+            # Client disconnected mid-stream
+            raise
+        except Exception as e:
+            logger.error(f"Chat stream for session {session_id} cut off: {str(e)}")
+            yield _sse_event("error", {"detail": "The response stream was interrupted."})
+        finally:
+            stream_slot.release()
+            # Keep the user's message even if no reply text arrived
+            with timing.phase("persist"):
+                await _save_streamed_turn(_build_turn(
+                    session_id, chat_data.message, "".join(chunks), agent_type, session_update,
+                    partial=not complete
+                ))
+            if chunks:
+                conversation_summary.schedule_refresh(session_id, context)
+            if session_update:
+                scenarios.on_stage_change(session_id, session_update["current_stage"], context)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(stream_slot.release)
+    )
+
+
+class _ChatConnection:
+    """Session state a WebSocket chat keeps in memory between turns.
+    
+    Turns update it as they are saved and the background summary refresh
+    reports back through :meth:`on_summary`, so nothing is reloaded per
+    turn. Turns sent for the same session over other channels while the
+    socket is open are not seen until it reconnects.
+    """
+    
+    def __init__(self, session: SessionSnapshot, history: List[Dict[str, str]]):
+        self.session_id = session.id
+        self.mode = session.mode
+        self.context = dict(session.context)
+        self.history = deque(history, maxlen=settings.CHAT_HISTORY_WINDOW)
+        self.summary = session.summary
+    
+    def record_turn(self, message: str, reply: str, agent_type: str, stage: Optional[str]) -> None:
+        self.history.append({"role": "user", "content": message})
+        if reply:
+            self.history.append({"role": agent_type, "content": reply})
+        if stage:
+            self.context["current_stage"] = stage
+    
+    def on_summary(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is None and task.result():
+            self.summary = task.result()
+
+
+@router.websocket("/ws/{session_id}")
+async def chat_websocket(websocket: WebSocket, session_id: int):
+    """Chat over one WebSocket for the lifetime of a session view.
+    
+    The client authenticates once (``?token=`` or a Bearer header) and
+    sends ``{"message": "..."}`` per turn. The server replies with
+    ``token`` events as text arrives, a ``session_update`` event when the
+    turn changes the stage, then ``done``; failures arrive as ``error``
+    events (with ``status`` and ``retry_after`` when rate limited) and the
+    connection stays open. Session context and the recent history window
+    are loaded once and kept in memory, so a turn costs the model call
+    plus one write.
+    """
+    async with AsyncSessionLocal() as db:
+        auth = await authenticate_websocket(websocket, db)
+        if auth is None:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid authentication credentials")
+            return
+        principal, expires_at = auth
+        try:
+            session = await _get_session(db, session_id, principal.id)
+        except HTTPException as e:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+            return
+        connection = _ChatConnection(session, await _load_history(db, session.id))
     
-    # Verify session belongs to user
-    session = db.query(SessionModel).filter(
-        SessionModel.id == session_id,
-        SessionModel.user_id == current_user.id
-    ).first()
+    await websocket.accept()
+    try:
+        while True:
+            message = _parse_ws_message(await websocket.receive_text())
+            if time.time() >= expires_at:
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token expired")
+                return
+            if message is None:
+                await websocket.send_json({"type": "error", "detail": 'Expected {"message": "<text>"}'})
+                continue
+            try:
+                slot = admission.admit(principal.id, "chat")
+            except HTTPException as e:
+                await websocket.send_json({
+                    "type": "error",
+                    "status": e.status_code,
+                    "detail": e.detail,
+                    "retry_after": int((e.headers or {}).get("Retry-After", 0))
+                })
+                continue
+            try:
+                await _ws_turn(websocket, connection, message)
+            finally:
+                slot.release()
+    except WebSocketDisconnect:
+        pass
+
+
+def _parse_ws_message(text: str) -> Optional[str]:
+    """The chat message in a client frame, or None if malformed"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    message = data.get("message") if isinstance(data, dict) else None
+    if not isinstance(message, str) or not message.strip():
+        return None
+    return message
+
+
+async def _ws_turn(websocket: WebSocket, connection: _ChatConnection, message: str) -> None:
+    """Answer one WebSocket chat message and save the turn"""
+    stage = connection.context["current_stage"]
+    agent, agent_type = _select_agent(stage)
+    session_update = _detect_stage_update(connection.mode, stage, message)
+    context = dict(connection.context)
+    
+    chunks: List[str] = []
+    complete = False
+    try:
+        async for chunk in agent.stream_response(message, context, list(connection.history), connection.summary):
+            chunks.append(chunk)
+            await websocket.send_json({"type": "token", "text": chunk})
+        complete = True
+    except (WebSocketDisconnect, asyncio.CancelledError):
+        raise
+    except Exception as e:
+        logger.error(f"WebSocket chat for session {connection.session_id} cut off: {str(e)}")
+        await websocket.send_json({"type": "error", "detail": "The response stream was interrupted."})
+    finally:
+        reply = "".join(chunks)
+        # Keep the user's message even if no reply text arrived
+        await _save_streamed_turn(_build_turn(
+            connection.session_id, message, reply, agent_type, session_update, partial=not complete
+        ))
+        connection.record_turn(message, reply, agent_type, (session_update or {}).get("current_stage"))
+        if reply:
+            refresh = conversation_summary.schedule_refresh(connection.session_id, context)
+            if refresh is not None:
+                refresh.add_done_callback(connection.on_summary)
+        if session_update:
+            scenarios.on_stage_change(connection.session_id, session_update["current_stage"], context)
+    
+    if session_update:
+        await websocket.send_json({"type": "session_update", "session_update": session_update})
+    if complete:
+        await websocket.send_json({"type": "done", "agent_type": agent_type})
+
+
+async def _get_session(db: AsyncSession, session_id: int, user_id: int) -> SessionSnapshot:
+    """Load one of the user's sessions (usually from the session cache) or raise 404"""
+    with timing.phase("session"):
+        session = await session_cache.get(db, session_id, user_id)
     
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
+    return session
+
+
+async def _load_history(db: AsyncSession, session_id: int) -> List[Dict[str, str]]:
+    """Load the most recent window of chat history as role/content dicts.
     
-    messages = db.query(Message).filter(
-        Message.session_id == session_id
-    ).order_by(Message.created_at).all()
+    Reads only the columns the agent needs and only the rows it will use,
+    served from the (session_id, created_at, id) index.
+    """
+    with timing.phase("history"):
+        rows = (await db.execute(
+            select(Message.role, Message.content).where(
+                Message.session_id == session_id
+            ).order_by(
+                Message.created_at.desc(), Message.id.desc()
+            ).limit(settings.CHAT_HISTORY_WINDOW)
+        )).all()
     
-    return messages
+    return [
+        {"role": role, "content": content}
+        for role, content in reversed(rows)
+    ]
 
 
-@router.post("/scenario/{session_id}")
-async def generate_scenario(
+def _select_agent(stage: str):
+    """Determine which agent to use based on stage"""
+    if stage in ["started", "subject_selected", "application_selected", "guidance"]:
+        return mentor_agent, "mentor"
+    elif stage in ["testing", "simulation"]:
+        return client_agent, "client"
+    return mentor_agent, "mentor"
+
+
+def _detect_stage_update(mode: str, stage: str, message: str) -> Optional[Dict[str, Any]]:
+    """Stage transition triggered by the user's message, if any.
+    
+    The current turn is still answered from the current stage; the change
+    is saved with the turn and applies from the next one.
+    """
+    target = stages.detect_transition(mode, stage, message)
+    if target is None:
+        return None
+    return {"current_stage": target}
+
+
+def _build_turn(
+    session_id: int,
+    user_message: str,
+    reply: str,
+    agent_type: str,
+    session_update: Optional[Dict[str, Any]],
+    partial: bool = False
+) -> turns.Turn:
+    """Rows for one chat turn: the user's message, the reply and stage change"""
+    turn = turns.Turn(
+        session_id=session_id,
+        stage=(session_update or {}).get("current_stage")
+    )
+    turn.add_message("user", user_message)
+    if reply:
+        turn.add_message(agent_type, reply, agent_type, {"partial": True} if partial else None)
+    return turn
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _save_streamed_turn(turn: turns.Turn) -> None:
+    """Persist a streamed turn with its own DB session.
+    
+    The request-scoped session is already released once the streaming
+    response starts, so the final write opens a fresh one. It runs from
+    ``finally`` blocks that a client disconnect cancels, so it is shielded
+    from cancellation; otherwise a cut-off turn would not be saved at all.
+    """
+    with anyio.CancelScope(shield=True):
+        async with AsyncSessionLocal() as db:
+            try:
+                await turns.persist_turn(db, turn)
+            except Exception as e:
+                logger.error(f"Failed to save streamed turn for session {turn.session_id}: {str(e)}")
+
+
+@router.get("/{session_id}/messages", response_model=Union[Page[MessageResponse], List[MessageResponse]])
+async def get_session_messages(
     session_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGINATION_MAX_LIMIT),
+    after: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Generate a new scenario for testing"""
+    """Get messages for a session, oldest first.
     
-    # Get session
-    session = db.query(SessionModel).filter(
-        SessionModel.id == session_id,
-        SessionModel.user_id == current_user.id
-    ).first()
+    Pass ``limit``/``after`` for a page with ``next_cursor``; without them
+    older clients get a plain list of the most recent
+    ``PAGINATION_LEGACY_LIMIT`` messages.
+    """
     
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
+    session = await _get_session(db, session_id, current_user.id)
     
-    # Prepare context
-    context = {
-        "mode": session.mode,
-        "subject": session.subject,
-        "project_idea": session.project_idea,
-        "business_type": session.business_type,
-        "location": session.location,
-        "business_idea": session.business_idea
-    }
+    messages, next_cursor = await paginate(
+        db,
+        select(Message).where(Message.session_id == session_id),
+        Message,
+        limit,
+        after,
+        response=response,
+        legacy_newest=True
+    )
+    if limit is None and after is None:
+        return messages
+    return Page[MessageResponse](items=messages, next_cursor=next_cursor)
+
+
+@router.post("/scenario/{session_id}", dependencies=[Depends(admit("scenario"))])
+async def generate_scenario(
+    session_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Generate a new scenario for testing.
     
-    # Generate scenario
-    scenario = await scenario_generator.generate_scenario(context)
+    Usually served from a scenario prefetched when the session entered
+    its testing/simulation stage, or from the shared pool; see
+    :mod:`app.services.scenarios`.
+    """
     
-    # Save as client message
-    scenario_message = Message(
-        session_id=session.id,
-        role="client",
-        content=scenario,
-        agent_type="scenario"
-    )
-    db.add(scenario_message)
+    session = await _get_session(db, session_id, current_user.id)
+    await db.commit()
+    
+    # Take a pre-generated scenario, or generate one
+    with timing.phase("scenario"):
+        scenario = await scenarios.get_scenario(session.id, session.context)
     
-    # Update session stage
-    session.current_stage = "simulation"
-    db.commit()
+    # Save as client message and move the session into simulation
+    with timing.phase("persist"):
+        await turns.persist_turn(db, turns.Turn(
+            session_id=session.id,
+            stage="simulation"
+        ).add_message("client", scenario, "scenario"))
     
     return {
         "scenario": scenario,
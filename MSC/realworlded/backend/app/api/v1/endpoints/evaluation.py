@@ -1,32 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-
-from app.db.database import get_db
-from app.models.models import User, Session as SessionModel, Message, Report
-from app.schemas.schemas import EvaluationRequest, EvaluationResponse, ReportResponse
-from app.api.deps import get_current_user
-from app.agents.agents import EvaluatorAgent
-
-router = APIRouter()
-
-# Initialize evaluator agent
-evaluator = EvaluatorAgent()
-
-
-@router.post("/", response_model=EvaluationResponse)
-async def evaluate_session(
-    eval_request: EvaluationRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Evaluate a session and generate a report"""
-    
-    # Get session
-    session = db.query(SessionModel).filter(
-        SessionModel.id == eval_request.session_id,
-        SessionModel.user_id == current_user.id
-    ).first()
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+import asyncio
+import json
+
+from app.core import timing
+from app.core.config import settings
+from app.db.database import get_db, AsyncSessionLocal
+from app.models.models import Report, EvaluationJob
+from app.schemas.schemas import EvaluationRequest, EvaluationResponse, ReportResponse, EvaluationJobResponse, Page
+from app.api.deps import Principal, get_current_user
+from app.api.admission import admit
+from app.api.pagination import paginate
+from app.services.evaluation import (
+    MIN_MESSAGES,
+    count_messages,
+    run_evaluation,
+    build_feedback_message,
+    job_queue,
+)
+from app.services.session_state import SessionSnapshot, session_cache
+
+router = APIRouter(route_class=timing.TimedRoute)
+
+
+async def _get_evaluable_session(db: AsyncSession, session_id: int, user_id: int) -> SessionSnapshot:
+    """Load a session owned by the user and check it has enough conversation"""
+    with timing.phase("session"):
+        session = await session_cache.get(db, session_id, user_id)
+        message_count = await count_messages(db, session.id) if session else 0
     
     if not session:
         raise HTTPException(
@@ -34,116 +38,149 @@ async def evaluate_session(
             detail="Session not found"
         )
     
-    # Get all messages
-    messages = db.query(Message).filter(
-        Message.session_id == session.id
-    ).order_by(Message.created_at).all()
-    
-    if len(messages) < 5:
+    if message_count < MIN_MESSAGES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Not enough conversation data to evaluate. Continue the session first."
         )
     
-    # Prepare context
-    context = {
-        "mode": session.mode,
-        "subject": session.subject,
-        "application": session.application,
-        "project_idea": session.project_idea,
-        "business_type": session.business_type,
-        "location": session.location,
-        "business_idea": session.business_idea,
-        "current_stage": session.current_stage
-    }
-    
-    # Convert messages to dict
-    messages_dict = [
-        {
-            "role": msg.role,
-            "content": msg.content,
-            "agent_type": msg.agent_type
-        }
-        for msg in messages
-    ]
-    
-    # Evaluate session
-    evaluation = await evaluator.evaluate_session(messages_dict, context)
-    
-    # Create report
-    report = Report(
-        user_id=current_user.id,
-        session_id=session.id,
-        technical_score=evaluation.get("technical_score"),
-        communication_score=evaluation.get("communication_score"),
-        creativity_score=evaluation.get("creativity_score"),
-        business_sense_score=evaluation.get("technical_score"),  # Use same for business
-        overall_score=evaluation.get("overall_score"),
-        strengths=evaluation.get("strengths"),
-        improvements=evaluation.get("improvements"),
-        detailed_feedback=evaluation.get("detailed_feedback"),
-        evaluation_data=evaluation
-    )
-    
-    db.add(report)
-    
-    # Mark session as completed
-    session.status = "completed"
+    return session
+
+
+@router.post("/", response_model=EvaluationResponse, dependencies=[Depends(admit("evaluation"))])
+async def evaluate_session(
+    eval_request: EvaluationRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Evaluate a session and generate a report"""
+    session = await _get_evaluable_session(db, eval_request.session_id, current_user.id)
     
-    db.commit()
-    db.refresh(report)
+    report = await run_evaluation(db, session)
     
-    # Generate feedback message
-    feedback_message = f"""🎉 Evaluation Complete!
+    return EvaluationResponse(
+        report=report,
+        feedback_message=build_feedback_message(report)
+    )
 
-**Overall Score: {report.overall_score}/10**
 
-📊 Detailed Scores:
-- Technical/Business Skills: {report.technical_score}/10
-- Communication: {report.communication_score}/10
-- Creativity: {report.creativity_score}/10
+@router.post(
+    "/jobs",
+    response_model=EvaluationJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admit("evaluation"))]
+)
+async def create_evaluation_job(
+    eval_request: EvaluationRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue a session evaluation and return the job right away"""
+    session = await _get_evaluable_session(db, eval_request.session_id, current_user.id)
+    return await job_queue.submit(db, session)
 
-✅ **Strengths:**
-{chr(10).join(f"• {s}" for s in report.strengths)}
 
-🎯 **Areas for Improvement:**
-{chr(10).join(f"• {i}" for i in report.improvements)}
+@router.get("/jobs/{job_id}", response_model=EvaluationJobResponse)
+async def get_evaluation_job(
+    job_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the status of an evaluation job"""
+    job = await db.scalar(select(EvaluationJob).where(
+        EvaluationJob.id == job_id,
+        EvaluationJob.user_id == current_user.id
+    ))
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Evaluation job not found"
+        )
+    
+    return job
 
-💬 **Detailed Feedback:**
-{report.detailed_feedback}
 
-Keep practicing to improve your skills! 🚀"""
-    
-    return EvaluationResponse(
-        report=report,
-        feedback_message=feedback_message
+@router.get("/jobs/{job_id}/events")
+async def stream_evaluation_job(
+    job_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Subscribe to an evaluation job's status changes over server-sent events.
+    
+    Sends a ``status`` event on every change and closes the stream once the
+    job has completed or failed. A job deleted along with its session ends
+    the stream with a ``failed`` status.
+    """
+    # Raises 404 unless the job belongs to the user
+    job = await get_evaluation_job(job_id, current_user, db)
+    payload = EvaluationJobResponse.model_validate(job).model_dump(mode="json")
+    
+    async def event_stream():
+        nonlocal payload
+        last_status = None
+        while True:
+            async with AsyncSessionLocal() as job_db:
+                job = await job_db.get(EvaluationJob, job_id)
+                if job is None:
+                    payload = {**payload, "status": "failed", "error": "Evaluation job not found"}
+                    yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+                    return
+                payload = EvaluationJobResponse.model_validate(job).model_dump(mode="json")
+            
+            if payload["status"] != last_status:
+                last_status = payload["status"]
+                yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+            if last_status in ("completed", "failed"):
+                return
+            await asyncio.sleep(settings.EVALUATION_JOB_POLL_INTERVAL)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
-@router.get("/reports", response_model=List[ReportResponse])
-def get_user_reports(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@router.get("/reports", response_model=Union[Page[ReportResponse], List[ReportResponse]])
+async def get_user_reports(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGINATION_MAX_LIMIT),
+    after: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all reports for current user"""
-    reports = db.query(Report).filter(
-        Report.user_id == current_user.id
-    ).order_by(Report.created_at.desc()).all()
-    
-    return reports
+    """Get reports for current user, newest first.
+    
+    Pass ``limit``/``after`` for a page with ``next_cursor``; without them
+    a plain list is returned for older clients.
+    """
+    reports, next_cursor = await paginate(
+        db,
+        select(Report).where(Report.user_id == current_user.id),
+        Report,
+        limit,
+        after,
+        descending=True,
+        response=response
+    )
+    if limit is None and after is None:
+        return reports
+    return Page[ReportResponse](items=reports, next_cursor=next_cursor)
 
 
 @router.get("/reports/{report_id}", response_model=ReportResponse)
-def get_report(
+async def get_report(
     report_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific report"""
-    report = db.query(Report).filter(
+    report = await db.scalar(select(Report).where(
         Report.id == report_id,
         Report.user_id == current_user.id
-    ).first()
+    ))
     
     if not report:
         raise HTTPException(
@@ -155,18 +192,15 @@ def get_report(
 
 
 @router.get("/session/{session_id}/report", response_model=ReportResponse)
-def get_session_report(
+async def get_session_report(
     session_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get report for a specific session"""
     
     # Verify session belongs to user
-    session = db.query(SessionModel).filter(
-        SessionModel.id == session_id,
-        SessionModel.user_id == current_user.id
-    ).first()
+    session = await session_cache.get(db, session_id, current_user.id)
     
     if not session:
         raise HTTPException(
@@ -174,9 +208,9 @@ def get_session_report(
             detail="Session not found"
         )
     
-    report = db.query(Report).filter(
+    report = await db.scalar(select(Report).where(
         Report.session_id == session_id
-    ).first()
+    ))
     
     if not report:
         raise HTTPException(
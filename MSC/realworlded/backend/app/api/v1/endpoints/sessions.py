@@ -1,20 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 
+from app.core.timing import TimedRoute
 from app.db.database import get_db
-from app.models.models import User, Session as SessionModel
-from app.schemas.schemas import SessionCreate, SessionResponse, SessionUpdate
-from app.api.deps import get_current_user
+from app.models.models import Session as SessionModel
+from app.schemas.schemas import SessionCreate, SessionResponse, SessionUpdate, Page
+from app.api.deps import Principal, get_current_user
+from app.api.pagination import paginate
+from app.core.config import settings
+from app.services.session_state import session_cache
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post("/", response_model=SessionResponse, status_code=status.HTTP_201_CREATED)
-def create_session(
+async def create_session(
     session_data: SessionCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new learning session"""
     
@@ -36,33 +41,49 @@ def create_session(
     )
     
     db.add(new_session)
-    db.commit()
-    db.refresh(new_session)
+    await db.commit()
+    await db.refresh(new_session)
     
     return new_session
 
 
-@router.get("/", response_model=List[SessionResponse])
-def get_user_sessions(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@router.get("/", response_model=Union[Page[SessionResponse], List[SessionResponse]])
+async def get_user_sessions(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGINATION_MAX_LIMIT),
+    after: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all sessions for current user"""
-    sessions = db.query(SessionModel).filter(SessionModel.user_id == current_user.id).all()
-    return sessions
+    """Get sessions for current user, oldest first.
+    
+    Pass ``limit``/``after`` for a page with ``next_cursor``; without them
+    a plain list is returned for older clients.
+    """
+    sessions, next_cursor = await paginate(
+        db,
+        select(SessionModel).where(SessionModel.user_id == current_user.id),
+        SessionModel,
+        limit,
+        after,
+        response=response
+    )
+    if limit is None and after is None:
+        return sessions
+    return Page[SessionResponse](items=sessions, next_cursor=next_cursor)
 
 
 @router.get("/{session_id}", response_model=SessionResponse)
-def get_session(
+async def get_session(
     session_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific session"""
-    session = db.query(SessionModel).filter(
+    session = await db.scalar(select(SessionModel).where(
         SessionModel.id == session_id,
         SessionModel.user_id == current_user.id
-    ).first()
+    ))
     
     if not session:
         raise HTTPException(
@@ -74,17 +95,17 @@ def get_session(
 
 
 @router.patch("/{session_id}", response_model=SessionResponse)
-def update_session(
+async def update_session(
     session_id: int,
     session_update: SessionUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a session"""
-    session = db.query(SessionModel).filter(
+    session = await db.scalar(select(SessionModel).where(
         SessionModel.id == session_id,
         SessionModel.user_id == current_user.id
-    ).first()
+    ))
     
     if not session:
         raise HTTPException(
@@ -97,23 +118,24 @@ def update_session(
     for field, value in update_data.items():
         setattr(session, field, value)
     
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
+    session_cache.store(session)
     
     return session
 
 
 @router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_session(
+async def delete_session(
     session_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a session"""
-    session = db.query(SessionModel).filter(
+    session = await db.scalar(select(SessionModel).where(
         SessionModel.id == session_id,
         SessionModel.user_id == current_user.id
-    ).first()
+    ))
     
     if not session:
         raise HTTPException(
@@ -121,7 +143,8 @@ def delete_session(
             detail="Session not found"
         )
     
-    db.delete(session)
-    db.commit()
+    await db.delete(session)
+    await db.commit()
+    session_cache.invalidate(session_id)
     
     return None
@@ -0,0 +1,101 @@
+"""Small in-process caches shared by the API layer."""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a TTL.
+
+    Not thread-safe; meant for use from the event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop every entry whose key matches ``predicate``"""
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class KeyConflictError(ValueError):
+    """Raised when a :class:`SingleFlight` key is reused for different work"""
+
+
+class SingleFlight:
+    """Coalesces concurrent and recently repeated calls sharing a key.
+
+    The first caller for a key runs the work as a task; callers arriving
+    while it is in flight await the same task, and callers within ``ttl``
+    seconds after it succeeded get its stored result. Failures are shared
+    with in-flight waiters but not stored. The task is shielded, so it
+    finishes (and its result is stored) even if every caller goes away.
+
+    Callers may pass a ``fingerprint`` of the work; a caller whose
+    fingerprint differs from the first caller's gets
+    :class:`KeyConflictError` instead of the shared result.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.results = TTLCache(maxsize, ttl)
+        self._in_flight: Dict[Hashable, Tuple[asyncio.Task, Hashable]] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], fingerprint: Hashable = None) -> Any:
+        stored = self.results.get(key)
+        if stored is not None:
+            result, owner = stored
+            self._check(key, owner, fingerprint)
+            return result
+        entry = self._in_flight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(fn())
+            entry = self._in_flight[key] = (task, fingerprint)
+            task.add_done_callback(lambda done: self._finish(key, fingerprint, done))
+        task, owner = entry
+        self._check(key, owner, fingerprint)
+        return await asyncio.shield(task)
+
+    def _check(self, key: Hashable, owner: Hashable, fingerprint: Hashable) -> None:
+        if owner != fingerprint:
+            raise KeyConflictError(f"Key {key!r} was already used for different work")
+
+    def _finish(self, key: Hashable, fingerprint: Hashable, task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.results.set(key, (task.result(), fingerprint))
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -9,14 +10,122 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./realworlded.db"
+    DB_ENGINE_PROFILE: str = "auto"  # "auto", "default", "sqlite_wal" or "postgres"
+    WEB_CONCURRENCY: int = 1  # Worker processes sharing the database
+    DB_MAX_CONNECTIONS: int = 100  # Postgres connection budget across all workers
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a pooled connection is replaced
+    DB_POOL_TIMEOUT: int = 30
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MiB
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 65536
     
     # JWT Settings
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 43200  # 30 days
+    AUTH_CACHE_TTL: int = 60  # Seconds an authenticated principal is cached
+    AUTH_CACHE_SIZE: int = 10000
+    
+    # Password Hashing
+    PASSWORD_KDF: str = "scrypt"  # Scheme for new hashes: "scrypt", "bcrypt" or "sha256"
+    BCRYPT_ROUNDS: int = 12
+    SCRYPT_LN: int = 14  # log2 of the scrypt CPU/memory cost (n)
+    SCRYPT_R: int = 8
+    SCRYPT_P: int = 1
+    PASSWORD_HASH_WORKERS: int = 4  # Threads dedicated to hashing and verifying
     
     # Google Gemini Settings
     GEMINI_API_KEY: str = ""
+    GEMINI_MODEL: str = "gemini-2.0-flash-exp"
+    
+    # LLM Call Settings
+    LLM_PROVIDER: str = "gemini"  # "gemini" or "fake"
+    LLM_MAX_CONCURRENCY: int = 16  # In-flight LLM calls per process
+    LLM_EXECUTOR_WORKERS: int = 8  # Threads for clients without an async API
+    
+    # LLM Resilience
+    LLM_CALL_TIMEOUT: float = 30.0  # Seconds per attempt (streams: per chunk)
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BACKOFF: float = 0.25  # Base seconds, doubled per retry, full jitter
+    LLM_RETRY_BUDGET_RATIO: float = 0.1  # Retries/hedges earned per call
+    LLM_RETRY_BUDGET_MIN_PER_SECOND: float = 1.0  # Retries always allowed at this rate
+    LLM_BREAKER_FAILURES: int = 5  # Consecutive failures that open the circuit
+    LLM_BREAKER_RESET: float = 30.0  # Seconds open before a probe call
+    LLM_HEDGE_ENABLED: bool = False  # Send a second request once a call passes the recent p95
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Successful calls observed before hedging starts
+    
+    # LLM Response Cache
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL: float = 3600.0  # Seconds a cached response is served
+    LLM_CACHE_MAX_ENTRIES: int = 2000  # In-process LRU size
+    LLM_CACHE_PATH: str = "./llm_cache.db"  # SQLite file shared by workers on a host; empty disables
+    LLM_CACHE_DISK_MAX_ENTRIES: int = 50000
+    LLM_CACHE_EVALUATIONS: bool = False  # Also cache evaluator replies for identical transcripts
+    
+    # Session State Cache
+    SESSION_CACHE_SIZE: int = 10000  # Session snapshots kept per process
+    SESSION_CACHE_TTL: float = 30.0  # Seconds; bounds staleness across workers, 0 disables
+    
+    # Scenario Pool
+    SCENARIO_POOL_ENABLED: bool = True
+    SCENARIO_POOL_SIZE: int = 2  # Pre-generated scenarios kept per (mode, subject, business_type, location)
+    SCENARIO_POOL_MAX_KEYS: int = 256  # Least recently used keys beyond this are dropped
+    SCENARIO_POOL_TTL: float = 3600.0  # Seconds a pooled or prefetched scenario stays usable
+    
+    # Admission Control
+    LLM_MAX_QUEUE: int = 64  # LLM-backed requests allowed to wait beyond the concurrency cap
+    LLM_SHED_RETRY_AFTER: int = 5  # Retry-After seconds on 503 when shedding load
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_CHAT_PER_MINUTE: float = 20  # Per user
+    RATE_LIMIT_CHAT_BURST: int = 10
+    RATE_LIMIT_SCENARIO_PER_MINUTE: float = 6
+    RATE_LIMIT_SCENARIO_BURST: int = 3
+    RATE_LIMIT_EVALUATION_PER_MINUTE: float = 4
+    RATE_LIMIT_EVALUATION_BURST: int = 2
+    RATE_LIMIT_MAX_KEYS: int = 100000  # Buckets kept in memory
+    
+    # Request Timing
+    SERVER_TIMING_SAMPLE_RATE: float = 1.0  # Fraction of requests timed (header and log line)
+    SERVER_TIMING_LOG: bool = True  # Log one structured line per timed request
+    
+    # Pagination
+    PAGINATION_DEFAULT_LIMIT: int = 50
+    PAGINATION_MAX_LIMIT: int = 200
+    PAGINATION_LEGACY_LIMIT: int = 1000  # Rows returned to clients that don't paginate
+    
+    # Chat Settings
+    CHAT_HISTORY_WINDOW: int = 10  # Most recent messages sent to the agent
+    SUMMARY_EVERY_N_TURNS: int = 5  # Refresh the rolling summary after this many older turns
+    SUMMARY_MAX_WORDS: int = 250
+    PROMPT_TOKEN_BUDGET: int = 3000  # Estimated tokens per agent prompt
+    PROMPT_CONTEXT_CACHE_SIZE: int = 1024  # Cached per-session context blocks
+    
+    # Evaluation
+    EVALUATION_MAP_REDUCE: bool = True  # Score long transcripts in concurrent chunks
+    EVALUATION_CHUNK_TOKENS: int = 6000  # Estimated transcript tokens per chunk
+    EVALUATION_CHUNK_CONCURRENCY: int = 4  # Chunks of one evaluation scored at once
+    
+    # Duplicate Chat Requests
+    CHAT_DEDUP_WINDOW: float = 10.0  # Seconds a finished reply is served to repeats
+    CHAT_DEDUP_CACHE_SIZE: int = 10000
+    
+    # Turn Persistence
+    TURN_WRITE_BEHIND: bool = False  # Group-commit turns after responding; see app/services/turns.py
+    WRITE_BEHIND_INTERVAL_MS: int = 5  # Max delay before queued turns are committed
+    WRITE_BEHIND_MAX_BATCH: int = 500  # Turns per group commit
+    
+    # Evaluation Jobs
+    EVALUATION_WORKERS: int = 2  # Concurrent evaluation jobs per process
+    EVALUATION_JOB_POLL_INTERVAL: float = 1.0  # Seconds between SSE status checks
+    EVALUATION_JOB_LEASE: float = 300.0  # Seconds without a heartbeat before another worker may take a running job
+    
+    # Fake LLM Provider (tests and benchmarks)
+    FAKE_LLM_LATENCY: float = 0.5  # Seconds before the first token
+    FAKE_LLM_TOKENS: int = 40
+    FAKE_LLM_TOKEN_DELAY: float = 0.01  # Seconds between tokens
+    FAKE_LLM_LATENCY_DIST: str = "fixed"  # "fixed", "uniform", "exponential" or "lognormal" around FAKE_LLM_LATENCY
+    FAKE_LLM_FAILURE_RATE: float = 0.0  # Share of calls that raise
+    FAKE_LLM_SEED: Optional[int] = None
     
     class Config:
         env_file = ".env"
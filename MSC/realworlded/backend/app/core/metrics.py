@@ -0,0 +1,229 @@
+"""Prometheus metrics for the LLM, database and HTTP hot paths.
+
+Everything is pre-aggregated in-process (counters and fixed-bucket
+histograms) and scraped from ``/metrics``. Database work is tallied per
+request in a context-local counter and folded into the per-route metrics
+once when the request ends, so instrumented queries only pay for two
+additions. With several worker processes, set ``PROMETHEUS_MULTIPROC_DIR``
+to aggregate across them.
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SIZE_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+# LLM calls
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds",
+    "LLM call latency (streams: until the last chunk)",
+    ["agent", "operation", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+)
+LLM_FIRST_CHUNK_SECONDS = Histogram(
+    "llm_stream_first_chunk_seconds",
+    "Time to the first streamed chunk",
+    ["agent"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8)
+)
+LLM_PROMPT_CHARS = Histogram(
+    "llm_prompt_chars", "Prompt size in characters", ["agent"], buckets=SIZE_BUCKETS
+)
+LLM_RESPONSE_CHARS = Histogram(
+    "llm_response_chars", "Response size in characters", ["agent"], buckets=SIZE_BUCKETS
+)
+LLM_FALLBACKS = Counter(
+    "llm_fallbacks_total",
+    "Canned responses served instead of a model reply",
+    ["agent", "reason"]
+)
+LLM_RETRIES = Counter("llm_retries_total", "LLM call attempts retried after a failure", ["agent"])
+LLM_HEDGES = Counter("llm_hedges_total", "Hedged second requests sent for slow LLM calls", ["agent"])
+LLM_CACHE_REQUESTS = Counter(
+    "llm_cache_requests_total",
+    "Response cache lookups by result (memory, disk or miss)",
+    ["agent", "result"]
+)
+LLM_CACHE_BYTES_SAVED = Counter(
+    "llm_cache_bytes_saved_total",
+    "Prompt and response bytes not exchanged with the model thanks to cache hits",
+    ["agent"]
+)
+EVALUATION_PARSE_FAILURES = Counter(
+    "evaluation_parse_failures_total",
+    "Evaluation replies that were not a JSON object"
+)
+
+# Scenario pool
+SCENARIO_POOL_REQUESTS = Counter(
+    "scenario_pool_requests_total",
+    "Scenario requests by where the scenario came from (pool, prefetch or miss)",
+    ["result"]
+)
+SCENARIO_POOL_EVICTIONS = Counter(
+    "scenario_pool_evictions_total", "Pooled scenarios dropped unused", ["reason"]
+)
+SCENARIO_POOL_ENTRIES = Gauge(
+    "scenario_pool_entries", "Scenarios waiting in the pool", multiprocess_mode="livesum"
+)
+
+# Database
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "Latency of individual SQL statements",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+)
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed", ["route"])
+DB_ROUTE_SECONDS = Counter("db_query_seconds_total", "Time spent in SQL statements", ["route"])
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements per HTTP request", ["route"], buckets=QUERY_COUNT_BUCKETS
+)
+
+# HTTP
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template (streams: until the body ends)",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+BACKGROUND_ROUTE = "background"
+
+
+class _DBTally:
+    """Statements and time spent on them during one request"""
+
+    __slots__ = ("queries", "seconds", "closed")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.closed = False
+
+
+_db_tally: ContextVar[Optional[_DBTally]] = ContextVar("db_tally", default=None)
+
+
+def _record_query(elapsed: float) -> None:
+    DB_QUERY_SECONDS.observe(elapsed)
+    tally = _db_tally.get()
+    if tally is None or tally.closed:
+        # Outside a request, or a task that outlived the one that spawned it
+        DB_QUERIES.labels(BACKGROUND_ROUTE).inc()
+        DB_ROUTE_SECONDS.labels(BACKGROUND_ROUTE).inc(elapsed)
+        return
+    tally.queries += 1
+    tally.seconds += elapsed
+
+
+def instrument_engine(engine: Engine) -> Engine:
+    """Time every statement run through ``engine`` (the sync core of async engines too)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _record_query(time.perf_counter() - conn.info["query_start"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            _record_query(time.perf_counter() - conn.info["query_start"].pop())
+
+    return engine
+
+
+def observe_llm_call(
+    agent: str,
+    operation: str,
+    elapsed: float,
+    prompt_chars: int,
+    response_chars: Optional[int],
+    cancelled: bool = False
+) -> None:
+    """Record one LLM call; ``response_chars`` is None if it failed or was cancelled.
+    
+    Calls abandoned by their caller (a client hanging up, a losing hedge)
+    are recorded with outcome ``cancelled`` rather than ``error``.
+    """
+    if cancelled:
+        outcome = "cancelled"
+    else:
+        outcome = "error" if response_chars is None else "ok"
+    LLM_REQUEST_SECONDS.labels(agent, operation, outcome).observe(elapsed)
+    LLM_PROMPT_CHARS.labels(agent).observe(prompt_chars)
+    if response_chars is not None:
+        LLM_RESPONSE_CHARS.labels(agent).observe(response_chars)
+
+
+def record_fallback(agent: str, reason: str) -> None:
+    """Count a canned reply; ``reason`` is ``no_provider``, ``circuit_open`` or ``error``"""
+    LLM_FALLBACKS.labels(agent, reason).inc()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and DB work per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        tally = _DBTally()
+        token = _db_tally.set(tally)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            tally.closed = True
+            _db_tally.reset(token)
+            method, route = _route_labels(scope)
+            HTTP_REQUEST_SECONDS.labels(method, route, str(status_code)).observe(time.perf_counter() - start)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(tally.queries)
+            if tally.queries:
+                DB_QUERIES.labels(route).inc(tally.queries)
+                DB_ROUTE_SECONDS.labels(route).inc(tally.seconds)
+
+
+def _route_labels(scope) -> Tuple[str, str]:
+    # Use the matched route's template so ids don't explode label cardinality
+    route = scope.get("route")
+    path = getattr(route, "path", None) or "unmatched"
+    return scope["method"], path
+
+
+def render() -> Tuple[bytes, str]:
+    """Exposition payload and content type for the scrape endpoint"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
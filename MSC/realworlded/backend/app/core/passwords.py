@@ -0,0 +1,255 @@
+"""Pluggable password hashing.
+
+Stored hashes are identified by format, so several schemes can coexist:
+
+- ``sha256``: legacy ``<salt>$<hex digest>`` hashes, verify-only in practice
+- ``bcrypt``: ``$2b$<rounds>$...`` (also what passlib produces)
+- ``scrypt``: memory-hard, ``$scrypt$ln=<log2 n>,r=<r>,p=<p>$<salt>$<hash>``
+
+New hashes use ``PASSWORD_KDF``. Hashes in any other scheme, or with
+weaker parameters, are reported by :func:`verify_and_update` so callers
+can transparently upgrade them after a successful login. The async
+helpers run the KDF on a dedicated bounded thread pool, keeping login
+bursts off the event loop and the shared request threadpool.
+:func:`verify_dummy_async` spends the same KDF time on logins for unknown
+accounts, so response times don't reveal which emails are registered.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import secrets
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+class PasswordHasher(ABC):
+    """Interface for one password hashing scheme"""
+
+    scheme: str = "base"
+
+    @abstractmethod
+    def identify(self, hashed: str) -> bool:
+        """Whether ``hashed`` was produced by this scheme"""
+
+    @abstractmethod
+    def hash(self, password: str) -> str:
+        """Hash a password with the current parameters"""
+
+    @abstractmethod
+    def verify(self, password: str, hashed: str) -> bool:
+        """Check a password against a hash from this scheme"""
+
+    def needs_update(self, hashed: str) -> bool:
+        """Whether ``hashed`` uses weaker parameters than configured"""
+        return False
+
+
+class Sha256Hasher(PasswordHasher):
+    """Legacy single-round salted SHA-256"""
+
+    scheme = "sha256"
+
+    def identify(self, hashed: str) -> bool:
+        return not hashed.startswith("$") and hashed.count("$") == 1
+
+    def hash(self, password: str) -> str:
+        salt = secrets.token_hex(16)
+        pwd_hash = hashlib.sha256((salt + password).encode()).hexdigest()
+        return f"{salt}${pwd_hash}"
+
+    def verify(self, password: str, hashed: str) -> bool:
+        salt, pwd_hash = hashed.split("$")
+        new_hash = hashlib.sha256((salt + password).encode()).hexdigest()
+        return hmac.compare_digest(new_hash, pwd_hash)
+
+
+class BcryptHasher(PasswordHasher):
+    """bcrypt with a configurable cost factor"""
+
+    scheme = "bcrypt"
+
+    def __init__(self, rounds: int):
+        self.rounds = rounds
+
+    def identify(self, hashed: str) -> bool:
+        return hashed.startswith(("$2a$", "$2b$", "$2y$"))
+
+    def _secret(self, password: str) -> bytes:
+        # bcrypt only uses the first 72 bytes; truncate like passlib does
+        return password.encode()[:72]
+
+    def hash(self, password: str) -> str:
+        import bcrypt
+
+        return bcrypt.hashpw(self._secret(password), bcrypt.gensalt(rounds=self.rounds)).decode()
+
+    def verify(self, password: str, hashed: str) -> bool:
+        import bcrypt
+
+        return bcrypt.checkpw(self._secret(password), hashed.encode())
+
+    def needs_update(self, hashed: str) -> bool:
+        return int(hashed.split("$")[2]) < self.rounds
+
+
+class ScryptHasher(PasswordHasher):
+    """Memory-hard scrypt from the standard library"""
+
+    scheme = "scrypt"
+
+    def __init__(self, ln: int, r: int, p: int):
+        self.ln = ln
+        self.r = r
+        self.p = p
+
+    def identify(self, hashed: str) -> bool:
+        return hashed.startswith("$scrypt$")
+
+    def _derive(self, password: str, salt: bytes, ln: int, r: int, p: int) -> bytes:
+        n = 1 << ln
+        return hashlib.scrypt(
+            password.encode(), salt=salt, n=n, r=r, p=p,
+            maxmem=256 * n * r + (1 << 20), dklen=32
+        )
+
+    def _parse(self, hashed: str) -> Tuple[Dict[str, int], bytes, bytes]:
+        _, _, params, salt, digest = hashed.split("$")
+        values = {key: int(value) for key, value in (item.split("=") for item in params.split(","))}
+        return values, _b64decode(salt), _b64decode(digest)
+
+    def hash(self, password: str) -> str:
+        salt = secrets.token_bytes(16)
+        digest = self._derive(password, salt, self.ln, self.r, self.p)
+        return f"$scrypt$ln={self.ln},r={self.r},p={self.p}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, password: str, hashed: str) -> bool:
+        params, salt, digest = self._parse(hashed)
+        candidate = self._derive(password, salt, params["ln"], params["r"], params["p"])
+        return hmac.compare_digest(candidate, digest)
+
+    def needs_update(self, hashed: str) -> bool:
+        params, _, _ = self._parse(hashed)
+        return (params["ln"], params["r"], params["p"]) < (self.ln, self.r, self.p)
+
+
+def build_hashers(
+    bcrypt_rounds: Optional[int] = None,
+    scrypt_ln: Optional[int] = None
+) -> Dict[str, PasswordHasher]:
+    """Hashers for every supported scheme, with configured (or given) costs"""
+    return {
+        "sha256": Sha256Hasher(),
+        "bcrypt": BcryptHasher(bcrypt_rounds or settings.BCRYPT_ROUNDS),
+        "scrypt": ScryptHasher(scrypt_ln or settings.SCRYPT_LN, settings.SCRYPT_R, settings.SCRYPT_P),
+    }
+
+
+HASHERS = build_hashers()
+
+if settings.PASSWORD_KDF not in HASHERS:
+    raise ValueError(f"Unknown PASSWORD_KDF: {settings.PASSWORD_KDF}")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_dummy_hash: Optional[str] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Dedicated pool for KDF work, separate from the request threads"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="kdf"
+        )
+    return _executor
+
+
+def identify(hashed: str) -> Optional[PasswordHasher]:
+    """Find the hasher that produced ``hashed``"""
+    for hasher in HASHERS.values():
+        if hasher.identify(hashed):
+            return hasher
+    return None
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with the configured scheme"""
+    return HASHERS[settings.PASSWORD_KDF].hash(password)
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    """Verify a password against a hash in any supported scheme"""
+    hasher = identify(hashed)
+    if hasher is None:
+        return False
+    try:
+        return hasher.verify(password, hashed)
+    except (ValueError, KeyError):
+        return False
+
+
+def needs_rehash(hashed: str) -> bool:
+    """Whether a stored hash should be replaced with the configured scheme"""
+    hasher = identify(hashed)
+    if hasher is None or hasher.scheme != settings.PASSWORD_KDF:
+        return True
+    try:
+        return hasher.needs_update(hashed)
+    except (ValueError, KeyError, IndexError):
+        return True
+
+
+def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password and, if valid but outdated, return its new hash"""
+    if not verify_password(password, hashed):
+        return False, None
+    if needs_rehash(hashed):
+        return True, hash_password(password)
+    return True, None
+
+
+def verify_dummy(password: str) -> bool:
+    """Verify against a hash of a random password; always False"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(secrets.token_urlsafe(32))
+    verify_password(password, _dummy_hash)
+    return False
+
+
+async def hash_password_async(password: str) -> str:
+    """:func:`hash_password` on the KDF thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), hash_password, password)
+
+
+async def verify_and_update_async(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """:func:`verify_and_update` on the KDF thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), verify_and_update, password, hashed)
+
+
+async def verify_dummy_async(password: str) -> bool:
+    """:func:`verify_dummy` on the KDF thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), verify_dummy, password)
+
+
+def shutdown() -> None:
+    """Release the KDF threads (called on application shutdown)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -1,26 +1,18 @@
 from datetime import datetime, timedelta
 from typing import Optional
-import hashlib
-import secrets
 from jose import JWTError, jwt
 from app.core.config import settings
+from app.core import passwords
 
 
 def get_password_hash(password: str) -> str:
-    """Hash a password using SHA-256 with a salt"""
-    salt = secrets.token_hex(16)
-    pwd_hash = hashlib.sha256((salt + password).encode()).hexdigest()
-    return f"{salt}${pwd_hash}"
+    """Hash a password with the configured KDF (``PASSWORD_KDF``)"""
+    return passwords.hash_password(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a plain password against a hashed password"""
-    try:
-        salt, pwd_hash = hashed_password.split('$')
-        new_hash = hashlib.sha256((salt + plain_password).encode()).hexdigest()
-        return new_hash == pwd_hash
-    except Exception:
-        return False
+    """Verify a plain password against a hash in any supported format"""
+    return passwords.verify_password(plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
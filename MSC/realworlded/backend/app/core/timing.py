@@ -0,0 +1,162 @@
+"""Request-scoped phase timing.
+
+:class:`TimingMiddleware` gives each sampled request a
+:class:`RequestTimer` held in a context variable; code along the request
+path wraps its work in ``with phase("name"):``. Each request (and any
+task it spawns) sees only its own timer, so concurrent requests never mix
+timings. Unsampled requests have no timer and ``phase`` is a no-op.
+
+Phases are reported twice:
+
+- in a ``Server-Timing`` header, with the phases finished before the
+  response headers go out (for streams, that excludes the model call), and
+- in one structured ``app.timing`` log line once the body is done.
+
+Repeated phases (e.g. ``llm`` for concurrent evaluation chunks) are summed,
+so phases may overlap and add up to more than ``total``. ``serialize`` is
+the time between the endpoint returning and the response starting.
+"""
+import asyncio
+import functools
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.timing")
+
+
+class RequestTimer:
+    """Accumulated phase durations for one request"""
+
+    __slots__ = ("start", "phases", "handler_end")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.handler_end: Optional[float] = None
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def header(self) -> str:
+        """``Server-Timing`` value for the phases recorded so far"""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_timer: ContextVar[Optional[RequestTimer]] = ContextVar("request_timer", default=None)
+
+
+class _Phase:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer: RequestTimer, name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name: str):
+    """Context manager timing a named phase of the current request"""
+    timer = _timer.get()
+    return _NO_PHASE if timer is None else _Phase(timer, name)
+
+
+def record(name: str, seconds: float) -> None:
+    """Add an already measured duration to the current request"""
+    timer = _timer.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+def mark_handler_end() -> None:
+    """Note that the endpoint returned; the rest until headers is serialization"""
+    timer = _timer.get()
+    if timer is not None:
+        timer.handler_end = time.perf_counter()
+
+
+class TimedRoute(APIRoute):
+    """Route class that marks when the endpoint returns, to time serialization"""
+
+    def get_route_handler(self) -> Callable:
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def timed_call(*args, **kwargs):
+                try:
+                    return await call(*args, **kwargs)
+                finally:
+                    mark_handler_end()
+
+            self.dependant.call = timed_call
+        return super().get_route_handler()
+
+
+class TimingMiddleware:
+    """ASGI middleware that samples requests, adds ``Server-Timing`` and logs phases"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        token = _timer.set(timer)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if timer.handler_end is not None:
+                    timer.add("serialize", time.perf_counter() - timer.handler_end)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timer.header().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timer.reset(token)
+            if settings.SERVER_TIMING_LOG:
+                route = getattr(scope.get("route"), "path", None) or scope["path"]
+                logger.info(json.dumps({
+                    "method": scope["method"],
+                    "route": route,
+                    "status": status_code,
+                    "total_ms": round((time.perf_counter() - timer.start) * 1000, 1),
+                    "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in timer.phases.items()},
+                }))
@@ -1,25 +1,59 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.db.profiles import apply_profile, engine_options
 
-# Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+# Async drivers used for each database backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def get_async_url(url: str) -> str:
+    """Rewrite a database URL to use its async driver"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend: {backend}")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+# Create database engine (sync, for migrations and CLI scripts)
+engine = apply_profile(
+    create_engine(
+        settings.DATABASE_URL,
+        **engine_options(settings.DATABASE_URL, settings.DB_ENGINE_PROFILE)
+    ),
+    settings.DB_ENGINE_PROFILE
 )
 
-# Create session factory
+# Create async database engine (for the API)
+async_engine = create_async_engine(
+    get_async_url(settings.DATABASE_URL),
+    **engine_options(settings.DATABASE_URL, settings.DB_ENGINE_PROFILE)
+)
+apply_profile(async_engine.sync_engine, settings.DB_ENGINE_PROFILE)
+instrument_engine(async_engine.sync_engine)
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 # Base class for models
 Base = declarative_base()
 
 
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,35 @@
+"""Lightweight schema migrations for existing databases.
+
+``Base.metadata.create_all`` only creates indexes together with new tables,
+so indexes added to existing models are created here. Safe to run
+repeatedly; run directly with ``python -m app.db.migrations``.
+"""
+import logging
+
+from sqlalchemy.engine import Engine
+
+from app.db.database import Base, engine
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_indexes(bind: Engine) -> None:
+    """Create any model index missing from the database"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    logger.info("Database indexes verified")
+
+
+def run_migrations(bind: Engine = engine) -> None:
+    """Bring an existing database up to the current schema"""
+    # Import models so their tables are registered on Base.metadata
+    from app.models import models  # noqa: F401
+
+    Base.metadata.create_all(bind=bind)
+    ensure_indexes(bind)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_migrations()
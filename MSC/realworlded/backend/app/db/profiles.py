@@ -0,0 +1,78 @@
+"""Named database engine profiles.
+
+``DB_ENGINE_PROFILE`` selects how engines are tuned:
+
+- ``default``: SQLAlchemy defaults (the previous behaviour)
+- ``sqlite_wal``: WAL journal plus per-connection pragmas, so readers no
+  longer block behind writers
+- ``postgres``: a sized, pre-pinged, recycled connection pool
+- ``auto``: ``sqlite_wal`` or ``postgres`` depending on ``DATABASE_URL``
+"""
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+from app.core.config import settings
+
+PROFILES = ("default", "sqlite_wal", "postgres")
+
+
+def resolve_profile(url: str, profile: str = "auto") -> str:
+    """Pick the concrete profile for a database URL"""
+    backend = make_url(url).get_backend_name()
+    if profile == "auto":
+        profile = {"sqlite": "sqlite_wal", "postgresql": "postgres"}.get(backend, "default")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown database engine profile: {profile}")
+    if profile == "sqlite_wal" and backend != "sqlite":
+        raise ValueError("The sqlite_wal profile requires a SQLite DATABASE_URL")
+    if profile == "postgres" and backend != "postgresql":
+        raise ValueError("The postgres profile requires a PostgreSQL DATABASE_URL")
+    return profile
+
+
+def postgres_pool_options(workers: int) -> Dict[str, Any]:
+    """Split the server's connection budget across worker processes.
+
+    Each worker gets a steady pool plus overflow that together stay within
+    ``DB_MAX_CONNECTIONS / workers``.
+    """
+    per_worker = max(2, settings.DB_MAX_CONNECTIONS // max(workers, 1))
+    pool_size = max(1, per_worker * 2 // 3)
+    return {
+        "pool_size": pool_size,
+        "max_overflow": per_worker - pool_size,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+
+
+def engine_options(url: str, profile: str = "auto") -> Dict[str, Any]:
+    """Keyword arguments for ``create_engine``/``create_async_engine``"""
+    profile = resolve_profile(url, profile)
+    options: Dict[str, Any] = {}
+    if make_url(url).get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    if profile == "postgres":
+        options.update(postgres_pool_options(settings.WEB_CONCURRENCY))
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    # Negative cache_size is in KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+    cursor.close()
+
+
+def apply_profile(engine: Engine, profile: str = "auto") -> Engine:
+    """Install per-connection hooks for the profile on a (sync) engine"""
+    if resolve_profile(str(engine.url), profile) == "sqlite_wal":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Float, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Float, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -22,6 +22,10 @@ class User(Base):
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # Keyset pagination of a user's sessions
+        Index("ix_sessions_user_created_id", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -48,10 +52,15 @@ class Session(Base):
     user = relationship("User", back_populates="sessions")
     messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
     reports = relationship("Report", back_populates="session", cascade="all, delete-orphan")
+    evaluation_jobs = relationship("EvaluationJob", back_populates="session", cascade="all, delete-orphan")
 
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Covers per-session history reads ordered by time
+        Index("ix_messages_session_created_id", "session_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False)
@@ -67,6 +76,10 @@ class Message(Base):
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        # Keyset pagination of a user's reports
+        Index("ix_reports_user_created_id", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -91,3 +104,19 @@ class Report(Base):
     # Relationships
     user = relationship("User", back_populates="reports")
     session = relationship("Session", back_populates="reports")
+
+
+class EvaluationJob(Base):
+    __tablename__ = "evaluation_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False)
+    status = Column(String, default="queued", index=True)  # "queued", "running", "completed", "failed"
+    report_id = Column(Integer, ForeignKey("reports.id"), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    session = relationship("Session", back_populates="evaluation_jobs")
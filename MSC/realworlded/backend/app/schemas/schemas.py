@@ -1,7 +1,15 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Generic, TypeVar
 from datetime import datetime
 
+T = TypeVar("T")
+
+
+# ==================== PAGINATION SCHEMAS ====================
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
 
 # ==================== USER SCHEMAS ====================
 class UserBase(BaseModel):
@@ -164,3 +172,16 @@ class EvaluationRequest(BaseModel):
 class EvaluationResponse(BaseModel):
     report: ReportResponse
     feedback_message: str
+
+
+class EvaluationJobResponse(BaseModel):
+    id: int
+    session_id: int
+    status: str
+    report_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
@@ -0,0 +1,267 @@
+"""Session evaluation, run inline or as background jobs.
+
+``run_evaluation`` is shared by the synchronous endpoint and the job
+workers. Jobs live in the ``evaluation_jobs`` table, so anything queued or
+running when a process stops is picked up again later.
+
+A worker claims a job with a conditional update, so each job runs once
+even with several workers and processes. While it runs, the worker
+refreshes the job's ``updated_at``; a running job whose heartbeat is older
+than ``EVALUATION_JOB_LEASE`` is presumed orphaned and may be claimed
+again. Every process re-queues such jobs on start and once per lease.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import timing
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.models import Session as SessionModel, Message, Report, EvaluationJob
+from app.agents.agents import EvaluatorAgent
+from app.services.session_state import SessionSnapshot, session_cache
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of messages before a session can be evaluated
+MIN_MESSAGES = 5
+
+evaluator = EvaluatorAgent()
+
+
+async def load_transcript(db: AsyncSession, session_id: int) -> List[Dict[str, Any]]:
+    """Load the full conversation as role/content/agent_type dicts"""
+    rows = (await db.execute(
+        select(Message.role, Message.content, Message.agent_type).where(
+            Message.session_id == session_id
+        ).order_by(Message.created_at, Message.id)
+    )).all()
+
+    return [
+        {"role": role, "content": content, "agent_type": agent_type}
+        for role, content, agent_type in rows
+    ]
+
+
+async def count_messages(db: AsyncSession, session_id: int) -> int:
+    return await db.scalar(
+        select(func.count(Message.id)).where(Message.session_id == session_id)
+    )
+
+
+async def run_evaluation(db: AsyncSession, session: SessionSnapshot) -> Report:
+    """Evaluate a session, save its report and mark the session completed"""
+    with timing.phase("transcript"):
+        messages = await load_transcript(db, session.id)
+    session_id, user_id = session.id, session.user_id
+
+    # Don't hold the connection while waiting on the model
+    await db.commit()
+
+    evaluation = await evaluator.evaluate_session(messages, session.context)
+
+    report = Report(
+        user_id=user_id,
+        session_id=session_id,
+        technical_score=evaluation.get("technical_score"),
+        communication_score=evaluation.get("communication_score"),
+        creativity_score=evaluation.get("creativity_score"),
+        business_sense_score=evaluation.get("technical_score"),  # Use same for business
+        overall_score=evaluation.get("overall_score"),
+        strengths=evaluation.get("strengths"),
+        improvements=evaluation.get("improvements"),
+        detailed_feedback=evaluation.get("detailed_feedback"),
+        evaluation_data=evaluation
+    )
+    db.add(report)
+
+    with timing.phase("persist"):
+        # Mark session as completed
+        await db.execute(
+            update(SessionModel).where(SessionModel.id == session_id).values(status="completed")
+        )
+
+        await db.commit()
+        session_cache.update(session_id, status="completed")
+        await db.refresh(report)
+    return report
+
+
+def build_feedback_message(report: Report) -> str:
+    """Render a report as the chat-style feedback message"""
+    return f"""🎉 Evaluation Complete!
+
+**Overall Score: {report.overall_score}/10**
+
+📊 Detailed Scores:
+- Technical/Business Skills: {report.technical_score}/10
+- Communication: {report.communication_score}/10
+- Creativity: {report.creativity_score}/10
+
+✅ **Strengths:**
+{chr(10).join(f"• {s}" for s in report.strengths or [])}
+
+🎯 **Areas for Improvement:**
+{chr(10).join(f"• {i}" for i in report.improvements or [])}
+
+💬 **Detailed Feedback:**
+{report.detailed_feedback}
+
+Keep practicing to improve your skills! 🚀"""
+
+
+def _claimable(db: AsyncSession, lease: float):
+    """Condition for jobs a worker may take: queued, or running with an expired lease"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=lease)
+    if db.bind.dialect.name == "sqlite":
+        # SQLite keeps server-side timestamps as UTC "YYYY-MM-DD HH:MM:SS" text
+        cutoff = func.datetime(cutoff.replace(tzinfo=None))
+    return or_(
+        EvaluationJob.status == "queued",
+        and_(
+            EvaluationJob.status == "running",
+            func.coalesce(EvaluationJob.updated_at, EvaluationJob.created_at) < cutoff
+        )
+    )
+
+
+class EvaluationJobQueue:
+    """In-process worker pool that runs queued evaluation jobs"""
+
+    def __init__(self, workers: int, lease: float):
+        self.workers = workers
+        self.lease = lease
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Start the workers and re-enqueue unfinished jobs from the database"""
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"evaluation-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+        pending = await self._enqueue_claimable()
+        if pending:
+            logger.info(f"Resumed {pending} unfinished evaluation jobs")
+        self._tasks.append(asyncio.create_task(self._sweep(), name="evaluation-sweeper"))
+
+    async def stop(self) -> None:
+        """Cancel the workers; unfinished jobs stay in the database"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, db: AsyncSession, session: SessionSnapshot) -> EvaluationJob:
+        """Record a new job for a session and queue it"""
+        job = EvaluationJob(user_id=session.user_id, session_id=session.id, status="queued")
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def _enqueue_claimable(self) -> int:
+        """Queue every job this process could claim right now"""
+        async with AsyncSessionLocal() as db:
+            job_ids = (await db.scalars(
+                select(EvaluationJob.id).where(_claimable(db, self.lease)).order_by(EvaluationJob.id)
+            )).all()
+        for job_id in job_ids:
+            self._queue.put_nowait(job_id)
+        return len(job_ids)
+
+    async def _sweep(self) -> None:
+        """Pick up jobs orphaned by other processes"""
+        while True:
+            await asyncio.sleep(self.lease)
+            try:
+                await self._enqueue_claimable()
+            except Exception as e:
+                logger.error(f"Evaluation job sweep failed: {str(e)}")
+
+    async def _claim(self, db: AsyncSession, job_id: int) -> bool:
+        """Atomically mark a job as running by this worker"""
+        result = await db.execute(
+            update(EvaluationJob).where(
+                EvaluationJob.id == job_id,
+                _claimable(db, self.lease)
+            ).values(status="running", updated_at=func.now())
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+    async def _heartbeat(self, job_id: int) -> None:
+        """Keep the lease on a running job fresh"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(EvaluationJob).where(
+                            EvaluationJob.id == job_id,
+                            EvaluationJob.status == "running"
+                        ).values(updated_at=func.now())
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"Evaluation job {job_id} heartbeat failed: {str(e)}")
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Evaluation worker {index} crashed on job {job_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: int) -> None:
+        async with AsyncSessionLocal() as db:
+            if not await self._claim(db, job_id):
+                # Finished, or running elsewhere
+                return
+            job = await db.get(EvaluationJob, job_id)
+            if job is None:
+                # Deleted along with its session
+                return
+            session = await db.get(SessionModel, job.session_id)
+            if session is None:
+                job.status = "failed"
+                job.error = "Session not found"
+                await db.commit()
+                return
+
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                report = await run_evaluation(db, session_cache.store(session))
+            except Exception as e:
+                logger.error(f"Evaluation job {job_id} failed: {str(e)}")
+                await db.rollback()
+                job = await db.get(EvaluationJob, job_id, populate_existing=True)
+                if job is None:
+                    return
+                job.status = "failed"
+                job.error = str(e)
+                await db.commit()
+                return
+            finally:
+                heartbeat.cancel()
+
+            # Reload; the session and its jobs may have been deleted meanwhile
+            job = await db.get(EvaluationJob, job_id, populate_existing=True)
+            if job is None:
+                return
+            job.status = "completed"
+            job.report_id = report.id
+            await db.commit()
+
+
+job_queue = EvaluationJobQueue(settings.EVALUATION_WORKERS, settings.EVALUATION_JOB_LEASE)
@@ -0,0 +1,164 @@
+"""Pre-generated scenarios so the scenario endpoint rarely waits on the model.
+
+Two sources are tried before generating on demand:
+
+- a speculative, session-specific scenario started as soon as a session
+  enters the ``testing``/``simulation`` stage (see :func:`prefetch`), and
+- a shared pool of generic scenarios keyed by
+  ``(mode, subject, business_type, location)``, refilled in the
+  background whenever a key is used.
+
+Pooled scenarios are generated from the key fields only, so they don't
+mention a session's project or business idea; prefetched ones do. Entries
+expire after ``SCENARIO_POOL_TTL`` seconds, each key holds at most
+``SCENARIO_POOL_SIZE`` scenarios and the least recently used keys beyond
+``SCENARIO_POOL_MAX_KEYS`` are dropped. The pool is per process.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+from app.agents.agents import ScenarioGenerator
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+scenario_generator = ScenarioGenerator()
+
+# Stages whose next step is usually a request for a scenario
+PREFETCH_STAGES = frozenset({"testing", "simulation"})
+
+PoolKey = Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+def pool_key(context: Dict[str, Any]) -> PoolKey:
+    return (context.get("mode"), context.get("subject"), context.get("business_type"), context.get("location"))
+
+
+class ScenarioPool:
+    """Bounded, expiring pool of scenarios plus per-session prefetches"""
+
+    def __init__(self, size: int, max_keys: int, ttl: float):
+        self.size = size
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._pools: "OrderedDict[PoolKey, Deque[Tuple[str, float]]]" = OrderedDict()
+        self._refilling: Set[PoolKey] = set()
+        self._prefetched = TTLCache(max_keys, ttl)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def take(self, session_id: int, context: Dict[str, Any]) -> str:
+        """A scenario for the session: prefetched, pooled or freshly generated"""
+        key = pool_key(context)
+
+        task = self._prefetched.get(session_id)
+        if task is not None:
+            self._prefetched.pop(session_id)
+            scenario = await asyncio.shield(task)
+            if scenario:
+                metrics.SCENARIO_POOL_REQUESTS.labels("prefetch").inc()
+                self._schedule_refill(key)
+                return scenario
+
+        scenario = self._pop(key)
+        # After the pop, so a full pool that was just drawn from is topped up
+        self._schedule_refill(key)
+        if scenario is not None:
+            metrics.SCENARIO_POOL_REQUESTS.labels("pool").inc()
+            return scenario
+
+        metrics.SCENARIO_POOL_REQUESTS.labels("miss").inc()
+        return await scenario_generator.generate_scenario(context)
+
+    def prefetch(self, session_id: int, context: Dict[str, Any]) -> None:
+        """Start generating this session's next scenario in the background"""
+        if self._prefetched.get(session_id) is not None:
+            return
+        self._prefetched.set(session_id, self._spawn(
+            scenario_generator.generate_scenario(context, fallback=False)
+        ))
+
+    def _pop(self, key: PoolKey) -> Optional[str]:
+        entries = self._pools.get(key)
+        if not entries:
+            return None
+        self._pools.move_to_end(key)
+        now = time.monotonic()
+        while entries:
+            scenario, expires_at = entries.popleft()
+            metrics.SCENARIO_POOL_ENTRIES.dec()
+            if expires_at > now:
+                return scenario
+            metrics.SCENARIO_POOL_EVICTIONS.labels("expired").inc()
+        return None
+
+    def _put(self, key: PoolKey, scenario: str) -> None:
+        entries = self._pools.setdefault(key, deque())
+        self._pools.move_to_end(key)
+        entries.append((scenario, time.monotonic() + self.ttl))
+        metrics.SCENARIO_POOL_ENTRIES.inc()
+        while len(self._pools) > self.max_keys:
+            _, dropped = self._pools.popitem(last=False)
+            metrics.SCENARIO_POOL_ENTRIES.dec(len(dropped))
+            metrics.SCENARIO_POOL_EVICTIONS.labels("overflow").inc(len(dropped))
+
+    def _live(self, key: PoolKey) -> int:
+        """Unexpired entries for ``key``, dropping expired ones from the front"""
+        entries = self._pools.get(key)
+        if not entries:
+            return 0
+        now = time.monotonic()
+        while entries and entries[0][1] <= now:
+            entries.popleft()
+            metrics.SCENARIO_POOL_ENTRIES.dec()
+            metrics.SCENARIO_POOL_EVICTIONS.labels("expired").inc()
+        return len(entries)
+
+    def _schedule_refill(self, key: PoolKey) -> None:
+        if key in self._refilling or self._live(key) >= self.size:
+            return
+        self._refilling.add(key)
+        task = self._spawn(self._refill(key))
+        task.add_done_callback(lambda _: self._refilling.discard(key))
+
+    async def _refill(self, key: PoolKey) -> None:
+        mode, subject, business_type, location = key
+        context = {"mode": mode, "subject": subject, "business_type": business_type, "location": location}
+        while self._live(key) < self.size:
+            scenario = await scenario_generator.generate_scenario(context, fallback=False)
+            if scenario is None:
+                # Model unavailable; don't spin, the next request retries
+                return
+            self._put(key, scenario)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def close(self) -> None:
+        """Cancel background generation (on shutdown)"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+pool = ScenarioPool(settings.SCENARIO_POOL_SIZE, settings.SCENARIO_POOL_MAX_KEYS, settings.SCENARIO_POOL_TTL)
+
+
+async def get_scenario(session_id: int, context: Dict[str, Any]) -> str:
+    """Scenario for a session, from the pool when enabled"""
+    if not settings.SCENARIO_POOL_ENABLED:
+        return await scenario_generator.generate_scenario(context)
+    return await pool.take(session_id, context)
+
+
+def on_stage_change(session_id: int, target_stage: str, context: Dict[str, Any]) -> None:
+    """Prefetch a scenario when a session moves into a stage that will want one"""
+    if settings.SCENARIO_POOL_ENABLED and target_stage in PREFETCH_STAGES:
+        pool.prefetch(session_id, context)
@@ -0,0 +1,112 @@
+"""Read-through cache of the session state the chat and evaluation paths use.
+
+Turns, scenarios and evaluations all need the same few ``Session`` fields
+and the agent context derived from them. :data:`session_cache` keeps an
+immutable :class:`SessionSnapshot` per session, built once on a miss, so
+a warm turn skips the session query and the context rebuild.
+
+Writers keep it current: session edits store the refreshed row, deletes
+invalidate, and stage transitions, summary refreshes and completed
+evaluations update the cached snapshot in place. The cache is per
+process; with several workers, changes made by another worker show up
+once the entry expires (``SESSION_CACHE_TTL``; 0 disables the cache).
+"""
+import dataclasses
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.models import Session as SessionModel
+
+# Session fields agents see as context
+CONTEXT_FIELDS = (
+    "mode",
+    "subject",
+    "application",
+    "project_idea",
+    "business_type",
+    "location",
+    "business_idea",
+    "current_stage",
+)
+
+
+@dataclass(frozen=True)
+class SessionSnapshot:
+    """Immutable copy of a session with its precomputed agent context"""
+    id: int
+    user_id: int
+    status: str
+    summary: Optional[str]
+    context: Mapping[str, Any]
+
+    @property
+    def mode(self) -> str:
+        return self.context["mode"]
+
+    @property
+    def current_stage(self) -> str:
+        return self.context["current_stage"]
+
+    @classmethod
+    def from_model(cls, session: SessionModel) -> "SessionSnapshot":
+        metadata = session.session_metadata or {}
+        return cls(
+            id=session.id,
+            user_id=session.user_id,
+            status=session.status,
+            summary=(metadata.get("summary") or {}).get("text"),
+            context=MappingProxyType({name: getattr(session, name) for name in CONTEXT_FIELDS})
+        )
+
+    def with_changes(self, **changes: Any) -> "SessionSnapshot":
+        """Copy with some fields (context fields included) replaced"""
+        context_changes = {name: changes.pop(name) for name in CONTEXT_FIELDS if name in changes}
+        if context_changes:
+            changes["context"] = MappingProxyType({**self.context, **context_changes})
+        return dataclasses.replace(self, **changes)
+
+
+class SessionStateCache:
+    """Size-bounded LRU of session snapshots with a TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize, ttl)
+
+    async def get(self, db: AsyncSession, session_id: int, user_id: int) -> Optional[SessionSnapshot]:
+        """The user's session, from the cache or the database; None if not theirs"""
+        state = self._cache.get(session_id)
+        if state is None:
+            session = await db.scalar(select(SessionModel).where(
+                SessionModel.id == session_id,
+                SessionModel.user_id == user_id
+            ))
+            if session is None:
+                return None
+            state = self.store(session)
+        if state.user_id != user_id:
+            return None
+        return state
+
+    def store(self, session: SessionModel) -> SessionSnapshot:
+        """Cache a freshly loaded or just-written session row"""
+        state = SessionSnapshot.from_model(session)
+        self._cache.set(session.id, state)
+        return state
+
+    def update(self, session_id: int, **changes: Any) -> None:
+        """Apply a write to the cached snapshot, if there is one"""
+        state = self._cache.get(session_id)
+        if state is not None:
+            self._cache.set(session_id, state.with_changes(**changes))
+
+    def invalidate(self, session_id: int) -> None:
+        self._cache.pop(session_id)
+
+
+session_cache = SessionStateCache(settings.SESSION_CACHE_SIZE, settings.SESSION_CACHE_TTL)
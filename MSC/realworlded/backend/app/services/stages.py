@@ -0,0 +1,123 @@
+"""Table-driven session stage transitions.
+
+Each mode has an ordered list of :class:`Transition` rules. A rule fires
+when the session is in one of its ``from_stages`` (any stage if empty) and
+the user's message contains at least one keyword from every group in
+``keywords``; the first matching rule wins.
+
+Keyword lookup is a single pass over the message: all keywords for a mode
+are compiled into one prefix-factored regex, so growing the keyword set
+does not add a scan per keyword. Matching is case-insensitive substring
+matching, as before ("java" also matches inside "javascript").
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+
+@dataclass(frozen=True)
+class Transition:
+    target: str
+    keywords: Tuple[Tuple[str, ...], ...]  # All groups must match; any keyword per group
+    from_stages: Tuple[str, ...] = ()  # Empty means any stage
+
+
+TRANSITIONS: Dict[str, List[Transition]] = {
+    "education": [
+        Transition(
+            target="subject_selected",
+            keywords=(("c++", "java", "python", "javascript"),),
+            from_stages=("started",)
+        ),
+        Transition(target="testing", keywords=(("project",), ("done",))),
+    ],
+    "business": [
+        Transition(
+            target="business_selected",
+            keywords=(("food", "clothing", "tech", "retail"),),
+            from_stages=("started",)
+        ),
+        Transition(target="simulation", keywords=(("ready",), ("pitch",))),
+    ],
+}
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex matching any of ``words``, factored on shared prefixes"""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: dict) -> str:
+        terminal = "" in node
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Prefer the longer keyword; a shorter prefix is credited separately
+        if terminal:
+            body = "(?:" + body + ")?"
+        return body
+
+    return render(trie)
+
+
+class KeywordMatcher:
+    """Finds every keyword occurring in a text in one regex pass"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: FrozenSet[str] = frozenset(k.lower() for k in keywords)
+        # Zero-width lookahead reports a match at every position, so
+        # overlapping keywords are all found
+        self._regex = re.compile(f"(?=({_trie_pattern(self.keywords)}))") if self.keywords else None
+        # Keywords that are prefixes of a longer keyword starting at the same spot
+        self._prefixes = {
+            keyword: {other for other in self.keywords if keyword.startswith(other)}
+            for keyword in self.keywords
+        }
+
+    def find(self, text: str) -> Set[str]:
+        if self._regex is None:
+            return set()
+        found: Set[str] = set()
+        for match in self._regex.finditer(text.lower()):
+            matched = match.group(1)
+            if matched:
+                found |= self._prefixes[matched]
+        return found
+
+
+class StageMachine:
+    """Ordered transition rules for one mode, with a compiled matcher"""
+
+    def __init__(self, transitions: List[Transition]):
+        self.transitions = transitions
+        self.matcher = KeywordMatcher(
+            keyword for transition in transitions for group in transition.keywords for keyword in group
+        )
+
+    def next_stage(self, current_stage: Optional[str], message: str) -> Optional[str]:
+        """Target stage for a message, or None when no rule fires"""
+        found = self.matcher.find(message)
+        if not found:
+            return None
+        for transition in self.transitions:
+            if transition.from_stages and current_stage not in transition.from_stages:
+                continue
+            if all(found.intersection(group) for group in transition.keywords):
+                return transition.target
+        return None
+
+
+STAGE_MACHINES: Dict[str, StageMachine] = {
+    mode: StageMachine(transitions) for mode, transitions in TRANSITIONS.items()
+}
+
+
+def detect_transition(mode: str, current_stage: Optional[str], message: str) -> Optional[str]:
+    """Stage the session should move to after ``message``, if any"""
+    machine = STAGE_MACHINES.get(mode)
+    return machine.next_stage(current_stage, message) if machine else None
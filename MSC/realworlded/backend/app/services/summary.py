@@ -0,0 +1,105 @@
+"""Rolling conversation summary kept in ``Session.session_metadata``.
+
+Messages that have scrolled out of the agent's recent history window are
+folded into ``session_metadata["summary"]`` in the background, every
+``SUMMARY_EVERY_N_TURNS`` turns. The stored value looks like::
+
+    {"text": "...", "through_message_id": 123}
+
+where ``through_message_id`` is the newest message already summarized.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.models import Session as SessionModel, Message
+from app.agents.agents import ConversationSummarizer
+from app.services.session_state import session_cache
+
+logger = logging.getLogger(__name__)
+
+summarizer = ConversationSummarizer()
+
+# Session ids with a refresh in progress, and strong refs to their tasks
+_in_flight: Set[int] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+def schedule_refresh(session_id: int, context: Dict[str, Any]) -> Optional["asyncio.Task[Optional[str]]"]:
+    """Refresh the session's summary in the background if one is due.
+    
+    Returns the refresh task, whose result is the new summary text (None if
+    nothing changed), or None if a refresh is already running.
+    """
+    if session_id in _in_flight:
+        return None
+    _in_flight.add(session_id)
+    task = asyncio.create_task(_refresh(session_id, context))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    task.add_done_callback(lambda _: _in_flight.discard(session_id))
+    return task
+
+
+async def _window_start_id(db: AsyncSession, session_id: int) -> Optional[int]:
+    """Id of the oldest message still inside the recent history window"""
+    return await db.scalar(
+        select(Message.id).where(
+            Message.session_id == session_id
+        ).order_by(
+            Message.created_at.desc(), Message.id.desc()
+        ).offset(settings.CHAT_HISTORY_WINDOW - 1).limit(1)
+    )
+
+
+async def _refresh(session_id: int, context: Dict[str, Any]) -> Optional[str]:
+    async with AsyncSessionLocal() as db:
+        try:
+            session = await db.get(SessionModel, session_id)
+            if session is None:
+                return
+            stored = (session.session_metadata or {}).get("summary") or {}
+            through_id = stored.get("through_message_id", 0)
+
+            window_start = await _window_start_id(db, session_id)
+            if window_start is None:
+                return
+
+            # Older messages not yet folded into the summary
+            pending = (await db.execute(
+                select(Message.id, Message.role, Message.content).where(
+                    Message.session_id == session_id,
+                    Message.id > through_id,
+                    Message.id < window_start
+                ).order_by(Message.created_at, Message.id).limit(
+                    settings.SUMMARY_EVERY_N_TURNS * 4
+                )
+            )).all()
+            if len(pending) < settings.SUMMARY_EVERY_N_TURNS * 2:
+                return
+            await db.commit()  # Don't hold the connection while waiting on the model
+
+            text = await summarizer.summarize(
+                stored.get("text"),
+                [{"role": role, "content": content} for _, role, content in pending],
+                context
+            )
+            if not text:
+                return
+
+            await db.refresh(session)
+            metadata = dict(session.session_metadata or {})
+            metadata["summary"] = {"text": text, "through_message_id": pending[-1][0]}
+            session.session_metadata = metadata
+            await db.commit()
+            session_cache.update(session_id, summary=text)
+            return text
+        except Exception as e:
+            logger.error(f"Failed to refresh summary for session {session_id}: {str(e)}")
+            await db.rollback()
+    return None
@@ -0,0 +1,179 @@
+"""Persistence of complete conversation turns.
+
+A turn is every row one request produces: the user's message, the agent's
+reply and any stage transition. :func:`persist_turn` writes all of it in a
+single transaction, so a turn is either fully stored or not at all.
+
+With ``TURN_WRITE_BEHIND`` enabled, turns are instead handed to
+:data:`turn_writer`, which group-commits the turns of many concurrent
+sessions in one transaction every ``WRITE_BEHIND_INTERVAL_MS``. This trades
+durability for write throughput; in that mode:
+
+- The response is sent before the turn is committed. A turn is lost if the
+  process dies before the next flush (at most one interval plus the commit).
+- Graceful shutdown flushes everything queued.
+- A reader may not see a turn until it is flushed, including the next
+  request in the same session if it arrives within the interval.
+- If a batch fails, its turns are retried one transaction each, so a bad
+  turn cannot take the rest of the batch down with it. Turns that still
+  fail are logged and dropped.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.models import Session as SessionModel, Message
+from app.services.session_state import session_cache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Turn:
+    """Rows written for one conversation turn"""
+    session_id: int
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    stage: Optional[str] = None  # New current_stage, if the turn changed it
+
+    def add_message(
+        self,
+        role: str,
+        content: str,
+        agent_type: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> "Turn":
+        self.messages.append({
+            "session_id": self.session_id,
+            "role": role,
+            "content": content,
+            "agent_type": agent_type,
+            "message_metadata": metadata,
+        })
+        return self
+
+
+async def _write(db: AsyncSession, turns: List[Turn]) -> None:
+    """Insert the messages and apply the stage changes of ``turns``"""
+    # Rows are inserted in order, so ids follow the conversation order
+    rows = [row for turn in turns for row in turn.messages]
+    if rows:
+        await db.execute(insert(Message), rows)
+    for turn in turns:
+        if turn.stage is not None:
+            await db.execute(
+                update(SessionModel).where(
+                    SessionModel.id == turn.session_id
+                ).values(current_stage=turn.stage)
+            )
+
+
+async def write_turns(db: AsyncSession, turns: List[Turn]) -> None:
+    """Write one or more turns in a single transaction on ``db``"""
+    try:
+        await _write(db, turns)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+
+class TurnWriter:
+    """Write-behind queue that group-commits turns across sessions"""
+
+    def __init__(self, interval: float, max_batch: int):
+        self.interval = interval
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="turn-writer")
+
+    async def stop(self) -> None:
+        """Flush queued turns, then stop the writer"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def submit(self, turn: Turn) -> "asyncio.Future[bool]":
+        """Queue a turn; the future resolves to whether it was committed"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((turn, future))
+        return future
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            # Let concurrent requests join this commit
+            await asyncio.sleep(self.interval)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[Tuple[Turn, asyncio.Future]]) -> None:
+        async with AsyncSessionLocal() as db:
+            try:
+                await write_turns(db, [turn for turn, _ in batch])
+                for _, future in batch:
+                    _resolve(future, True)
+                return
+            except Exception as e:
+                logger.error(f"Group commit of {len(batch)} turns failed, retrying individually: {str(e)}")
+
+            for turn, future in batch:
+                try:
+                    await write_turns(db, [turn])
+                    _resolve(future, True)
+                except Exception as e:
+                    logger.error(f"Dropped turn for session {turn.session_id}: {str(e)}")
+                    _resolve(future, False)
+
+
+def _resolve(future: asyncio.Future, committed: bool) -> None:
+    if not future.done():
+        future.set_result(committed)
+
+
+turn_writer = TurnWriter(settings.WRITE_BEHIND_INTERVAL_MS / 1000, settings.WRITE_BEHIND_MAX_BATCH)
+
+
+def _uncache_if_dropped(session_id: int):
+    def callback(future: asyncio.Future) -> None:
+        if future.cancelled() or not future.result():
+            session_cache.invalidate(session_id)
+    return callback
+
+
+async def persist_turn(db: AsyncSession, turn: Turn) -> None:
+    """Store a turn, directly or through the write-behind queue.
+    
+    A stage change is applied to the session cache right away when
+    queued, and dropped from it again if the turn is never written.
+    """
+    if settings.TURN_WRITE_BEHIND and turn_writer.running:
+        committed = turn_writer.submit(turn)
+        if turn.stage is not None:
+            session_cache.update(turn.session_id, current_stage=turn.stage)
+            committed.add_done_callback(_uncache_if_dropped(turn.session_id))
+        return
+    await write_turns(db, [turn])
+    if turn.stage is not None:
+        session_cache.update(turn.session_id, current_stage=turn.stage)
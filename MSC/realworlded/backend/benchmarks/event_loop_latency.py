@@ -0,0 +1,115 @@
+"""Benchmark: cheap endpoint latency while slow LLM calls are in flight.
+
+Runs the app in-process against a throwaway SQLite database, installs the
+fake LLM provider with a fixed latency, then measures ``/health`` latency on its own and
+while N concurrent chat requests are waiting on the model.
+
+Usage:
+    python -m benchmarks.event_loop_latency --concurrency 50 --llm-delay 2.0
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp(prefix="rwe-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_dir}/bench.db")
+# One benchmark user sends every request; don't let its budget cap the load
+os.environ.setdefault("RATE_LIMIT_ENABLED", "False")
+
+import httpx  # noqa: E402
+
+from main import app  # noqa: E402
+from app.db.database import Base, engine, SessionLocal, async_engine  # noqa: E402
+from app.models.models import User, Session as SessionModel  # noqa: E402
+from app.core.security import create_access_token, get_password_hash  # noqa: E402
+from app.agents.providers import FakeProvider, set_provider  # noqa: E402
+from app.core.config import settings  # noqa: E402
+
+
+def _setup() -> tuple:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(
+            email="bench@realworlded.com",
+            username="bench_user",
+            hashed_password=get_password_hash("bench123")
+        )
+        db.add(user)
+        db.commit()
+        session = SessionModel(user_id=user.id, mode="education", status="active", current_stage="started")
+        db.add(session)
+        db.commit()
+        return create_access_token({"sub": str(user.id)}), session.id
+    finally:
+        db.close()
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _probe_health(client: httpx.AsyncClient, duration: float, interval: float) -> list:
+    samples = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/health")
+        response.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return samples
+
+
+def _report(label: str, samples: list) -> None:
+    print(
+        f"{label:<24} n={len(samples):<5} "
+        f"p50={statistics.median(samples):7.2f}ms  "
+        f"p99={_percentile(samples, 99):7.2f}ms  "
+        f"max={max(samples):7.2f}ms"
+    )
+
+
+async def main(concurrency: int, llm_delay: float) -> None:
+    token, session_id = _setup()
+    set_provider(settings.LLM_PROVIDER, FakeProvider(latency=llm_delay, token_delay=0))
+
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        idle = await _probe_health(client, duration=llm_delay, interval=0.01)
+
+        async def send_chat(i: int):
+            response = await client.post(
+                "/api/v1/chat/",
+                json={"session_id": session_id, "message": f"benchmark message {i}"},
+                headers=headers
+            )
+            response.raise_for_status()
+
+        start = time.perf_counter()
+        chats = asyncio.gather(*(send_chat(i) for i in range(concurrency)))
+        loaded = await _probe_health(client, duration=llm_delay, interval=0.01)
+        await chats
+        elapsed = time.perf_counter() - start
+    await async_engine.dispose()
+
+    _report("/health idle", idle)
+    _report(f"/health {concurrency} chats", loaded)
+    print(f"{concurrency} chat calls completed in {elapsed:.2f}s (LLM delay {llm_delay:.2f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-delay", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.llm_delay))
@@ -0,0 +1,405 @@
+"""Benchmark: end-to-end load test of user flows against a live server.
+
+Starts ``main:app`` under uvicorn in a subprocess, backed by a throwaway
+SQLite database and the fake LLM provider (configurable latency
+distribution and failure rate). Virtual users then run complete flows
+concurrently:
+
+    signup -> create session -> chat turns (some streamed) -> scenario
+    -> more turns -> evaluation -> read messages
+
+until ``--flows`` flows have finished or ``--duration`` elapses. A share
+of streamed turns (``--disconnect-share``) hangs up mid-stream; each flow
+then checks that those turns were still saved. The result is one JSON
+document with throughput, latency percentiles per route, error rates,
+saved disconnected turns and LLM fallback rates (read from ``/metrics``),
+suitable for diffing between commits.
+
+Usage:
+    python -m benchmarks.load_test --users 20 --flows 100 --output load.json
+    python -m benchmarks.load_test --users 50 --duration 60 --latency 1.0 \\
+        --latency-dist lognormal --failure-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Recorder:
+    """Latency and status of every request, keyed by route label"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.disconnects = {"sent": 0, "saved": 0}
+        self.evaluations = {"total": 0, "map_reduce": 0}
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.latencies[label].append(time.perf_counter() - start)
+            self.errors[label] += 1
+            self.statuses[label][0] += 1
+            raise
+        self.latencies[label].append(time.perf_counter() - start)
+        self.statuses[label][response.status_code] += 1
+        if response.status_code >= 400:
+            self.errors[label] += 1
+        return response
+
+    async def stream(self, client: httpx.AsyncClient, label: str, url: str, **kwargs) -> Optional[str]:
+        """POST to an SSE endpoint, timing until the stream ends; returns the last event"""
+        start = time.perf_counter()
+        last_event = None
+        try:
+            async with client.stream("POST", url, **kwargs) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        last_event = line[len("event: "):]
+                status = response.status_code
+        except httpx.HTTPError:
+            status = 0
+        self.latencies[label].append(time.perf_counter() - start)
+        self.statuses[label][status] += 1
+        if status != 200 or last_event != "done":
+            self.errors[label] += 1
+        return last_event
+
+    async def disconnect(self, client: httpx.AsyncClient, label: str, url: str, events: int, **kwargs) -> None:
+        """POST to an SSE endpoint and hang up after ``events`` events"""
+        start = time.perf_counter()
+        seen = 0
+        try:
+            async with client.stream("POST", url, **kwargs) as response:
+                status = response.status_code
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        seen += 1
+                        if seen >= events:
+                            break
+        except httpx.HTTPError:
+            status = 0
+        self.latencies[label].append(time.perf_counter() - start)
+        self.statuses[label][status] += 1
+        if status != 200:
+            self.errors[label] += 1
+        else:
+            self.disconnects["sent"] += 1
+
+    def summary(self) -> Dict[str, dict]:
+        routes = {}
+        for label in sorted(self.latencies):
+            samples = sorted(self.latencies[label])
+            routes[label] = {
+                "count": len(samples),
+                "errors": self.errors[label],
+                "error_rate": round(self.errors[label] / len(samples), 4),
+                "statuses": {str(code): n for code, n in sorted(self.statuses[label].items())},
+                "mean_ms": round(statistics.fmean(samples) * 1000, 2),
+                "p50_ms": _percentile_ms(samples, 50),
+                "p90_ms": _percentile_ms(samples, 90),
+                "p99_ms": _percentile_ms(samples, 99),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+        return routes
+
+
+def _percentile_ms(ordered: List[float], pct: float) -> float:
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 2)
+
+
+async def run_flow(client: httpx.AsyncClient, recorder: Recorder, args, rng: random.Random) -> None:
+    """One user's journey; raises on the first failed step"""
+    name = f"load_{uuid.uuid4().hex[:12]}"
+    response = await recorder.request(client, "POST /auth/signup", "POST", "/api/v1/auth/signup", json={
+        "email": f"{name}@example.com", "username": name, "password": "load-test-password"
+    })
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    mode = rng.choice(["education", "business"])
+    response = await recorder.request(client, "POST /sessions/", "POST", "/api/v1/sessions/", headers=headers, json={
+        "mode": mode
+    })
+    response.raise_for_status()
+    session_id = response.json()["id"]
+
+    disconnected = []
+
+    async def chat_turn(turn: int) -> None:
+        payload = {"session_id": session_id, "message": f"{name} turn {turn}: " + rng.choice(TURN_TEXT[mode])}
+        if rng.random() < args.stream_share:
+            if rng.random() < args.disconnect_share:
+                await recorder.disconnect(
+                    client, "POST /chat/stream (disconnect)", "/api/v1/chat/stream", 2, headers=headers, json=payload
+                )
+                disconnected.append(payload["message"])
+            else:
+                await recorder.stream(client, "POST /chat/stream", "/api/v1/chat/stream", headers=headers, json=payload)
+        else:
+            response = await recorder.request(client, "POST /chat/", "POST", "/api/v1/chat/", headers=headers, json=payload)
+            response.raise_for_status()
+        await asyncio.sleep(rng.uniform(0, args.think_time))
+
+    half = args.turns // 2
+    for turn in range(half):
+        await chat_turn(turn)
+
+    response = await recorder.request(
+        client, "POST /chat/scenario/{id}", "POST", f"/api/v1/chat/scenario/{session_id}", headers=headers
+    )
+    response.raise_for_status()
+
+    for turn in range(half, args.turns):
+        await chat_turn(turn)
+
+    response = await recorder.request(client, "POST /evaluation/", "POST", "/api/v1/evaluation/", headers=headers, json={
+        "session_id": session_id
+    })
+    response.raise_for_status()
+    recorder.evaluations["total"] += 1
+    # Merged evaluations record how many transcript chunks were scored
+    if (response.json()["report"].get("evaluation_data") or {}).get("chunks"):
+        recorder.evaluations["map_reduce"] += 1
+
+    response = await recorder.request(
+        client, "GET /chat/{id}/messages", "GET", f"/api/v1/chat/{session_id}/messages",
+        headers=headers, params={"limit": 50}
+    )
+    response.raise_for_status()
+    # Turns cut off by a client disconnect must still be saved
+    stored = {message["content"] for message in response.json()["items"] if message["role"] == "user"}
+    recorder.disconnects["saved"] += sum(message in stored for message in disconnected)
+
+
+TURN_TEXT = {
+    "education": [
+        "I want to learn Python and build a budgeting app.",
+        "How should I structure the database for this?",
+        "My project is done, what should I test first?",
+        "Can you explain how to handle errors in the API?",
+    ],
+    "business": [
+        "I want to open a food truck in Austin.",
+        "What should my pricing look like?",
+        "I'm ready to pitch to investors.",
+        "How do I estimate my monthly costs?",
+    ],
+}
+
+
+def _scrape_llm(metrics_text: str) -> Dict[str, float]:
+    """LLM call, error, cancellation and fallback totals from a /metrics payload"""
+    totals = defaultdict(float, {"calls": 0.0, "errors": 0.0, "cancelled": 0.0, "fallbacks": 0.0})
+    for family in text_string_to_metric_families(metrics_text):
+        for sample in family.samples:
+            if sample.name == "llm_request_duration_seconds_count":
+                totals["calls"] += sample.value
+                if sample.labels.get("outcome") == "error":
+                    totals["errors"] += sample.value
+                elif sample.labels.get("outcome") == "cancelled":
+                    totals["cancelled"] += sample.value
+            elif sample.name == "llm_fallbacks_total":
+                totals["fallbacks"] += sample.value
+                totals[f"fallbacks.{sample.labels['agent']}"] += sample.value
+    return totals
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(args, port: int) -> subprocess.Popen:
+    run_dir = tempfile.mkdtemp(prefix="rwe-load-")
+    db_url = args.database_url or f"sqlite:///{run_dir}/load.db"
+    env = {
+        **os.environ,
+        "DATABASE_URL": db_url,
+        # Start every run with a cold response cache
+        "LLM_CACHE_PATH": os.path.join(run_dir, "llm_cache.db"),
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY": str(args.latency),
+        "FAKE_LLM_LATENCY_DIST": args.latency_dist,
+        "FAKE_LLM_FAILURE_RATE": str(args.failure_rate),
+        "FAKE_LLM_TOKENS": str(args.tokens),
+        "FAKE_LLM_TOKEN_DELAY": str(args.token_delay),
+        "FAKE_LLM_SEED": str(args.seed),
+        # Small chunks so flow-length transcripts take the map-reduce path
+        "EVALUATION_CHUNK_TOKENS": str(args.eval_chunk_tokens),
+        "RATE_LIMIT_ENABLED": str(args.rate_limits),
+        "SERVER_TIMING_LOG": "False",
+        "DEBUG": "False",
+    }
+    if args.workers > 1:
+        # Aggregate /metrics across the worker processes
+        env["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="rwe-metrics-")
+    # Create the schema up front so several workers don't race on it
+    subprocess.run([sys.executable, "-m", "app.db.migrations"], cwd=BACKEND_DIR, env=env, check=True)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env
+    )
+
+
+async def _wait_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args) -> dict:
+    port = _free_port()
+    server = _start_server(args, port)
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits
+        ) as client:
+            await _wait_ready(client, server)
+            llm_before = _scrape_llm((await client.get("/metrics")).text)
+
+            recorder = Recorder()
+            outcome = {"completed": 0, "failed": 0}
+            deadline = time.monotonic() + args.duration if args.duration else None
+            remaining = [args.flows]
+
+            async def virtual_user(index: int) -> None:
+                rng = random.Random(args.seed * 10007 + index)
+                while remaining[0] > 0 and (deadline is None or time.monotonic() < deadline):
+                    remaining[0] -= 1
+                    try:
+                        await run_flow(client, recorder, args, rng)
+                        outcome["completed"] += 1
+                    except (httpx.HTTPError, KeyError, ValueError):
+                        outcome["failed"] += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(virtual_user(i) for i in range(args.users)))
+            elapsed = time.perf_counter() - start
+
+            llm_after = _scrape_llm((await client.get("/metrics")).text)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    llm = {key: llm_after[key] - llm_before[key] for key in llm_after}
+    routes = recorder.summary()
+    total_requests = sum(route["count"] for route in routes.values())
+    total_errors = sum(route["errors"] for route in routes.values())
+    return {
+        "commit": _git_commit(),
+        "config": {
+            key: getattr(args, key) for key in (
+                "users", "flows", "duration", "turns", "stream_share", "disconnect_share", "think_time", "latency",
+                "latency_dist", "failure_rate", "tokens", "token_delay", "eval_chunk_tokens", "workers",
+                "rate_limits", "seed"
+            )
+        },
+        "elapsed_s": round(elapsed, 3),
+        "flows": {**outcome, "per_s": round(outcome["completed"] / elapsed, 3)},
+        "requests": {
+            "total": total_requests,
+            "errors": total_errors,
+            "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+            "per_s": round(total_requests / elapsed, 3),
+        },
+        "routes": routes,
+        "evaluations": recorder.evaluations,
+        "disconnects": {
+            **recorder.disconnects,
+            "lost": recorder.disconnects["sent"] - recorder.disconnects["saved"],
+        },
+        "llm": {
+            **{key: int(value) for key, value in llm.items()},
+            "error_rate": round(llm["errors"] / llm["calls"], 4) if llm["calls"] else 0.0,
+            "fallback_rate": round(llm["fallbacks"] / llm["calls"], 4) if llm["calls"] else 0.0,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--flows", type=int, default=100, help="Total flows to run")
+    parser.add_argument("--duration", type=float, default=None, help="Stop starting flows after this many seconds")
+    parser.add_argument("--turns", type=int, default=6, help="Chat turns per flow (min 3 for evaluation)")
+    parser.add_argument("--stream-share", type=float, default=0.25, help="Share of turns sent to /chat/stream")
+    parser.add_argument(
+        "--disconnect-share", type=float, default=0.2, help="Share of streamed turns that hang up mid-stream"
+    )
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max seconds a user pauses between turns")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean fake LLM latency in seconds")
+    parser.add_argument("--latency-dist", default="lognormal", choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of fake LLM calls that fail")
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument(
+        "--eval-chunk-tokens", type=int, default=300, help="EVALUATION_CHUNK_TOKENS for the server"
+    )
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--rate-limits", action="store_true", help="Keep per-user rate limits on")
+    parser.add_argument("--database-url", default=None, help="Defaults to a throwaway SQLite file")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Write the JSON result here instead of stdout")
+    args = parser.parse_args()
+    if args.turns < 3:
+        parser.error("--turns must be at least 3 so sessions have enough messages to evaluate")
+
+    result = asyncio.run(main(args))
+    payload = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+        print(
+            f"{result['flows']['completed']} flows ({result['flows']['failed']} failed) in {result['elapsed_s']}s, "
+            f"{result['requests']['per_s']} req/s, error rate {result['requests']['error_rate']}, "
+            f"LLM fallback rate {result['llm']['fallback_rate']}, "
+            f"{result['disconnects']['lost']} disconnected turns lost"
+        )
+    else:
+        print(payload)
@@ -0,0 +1,78 @@
+"""Benchmark: login (password verify) throughput per KDF and cost setting.
+
+Verifies ``--logins`` passwords concurrently through the dedicated KDF
+thread pool, the same path the login endpoint uses, and reports logins/s
+and latency percentiles for each scheme and cost.
+
+Usage:
+    python -m benchmarks.password_kdf --logins 200 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.passwords import BcryptHasher, ScryptHasher, Sha256Hasher  # noqa: E402
+from app.core.config import settings  # noqa: E402
+
+CONFIGS = [
+    ("sha256", None, Sha256Hasher()),
+    ("bcrypt", "rounds=10", BcryptHasher(10)),
+    ("bcrypt", "rounds=11", BcryptHasher(11)),
+    ("bcrypt", "rounds=12", BcryptHasher(12)),
+    ("scrypt", "ln=13", ScryptHasher(13, settings.SCRYPT_R, settings.SCRYPT_P)),
+    ("scrypt", "ln=14", ScryptHasher(14, settings.SCRYPT_R, settings.SCRYPT_P)),
+    ("scrypt", "ln=15", ScryptHasher(15, settings.SCRYPT_R, settings.SCRYPT_P)),
+]
+
+
+async def _bench(hasher, logins: int, workers: int) -> dict:
+    hashed = hasher.hash("correct horse battery staple")
+    executor = ThreadPoolExecutor(max_workers=workers)
+    loop = asyncio.get_running_loop()
+    latencies = []
+
+    async def login():
+        start = time.perf_counter()
+        ok = await loop.run_in_executor(executor, hasher.verify, "correct horse battery staple", hashed)
+        assert ok
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+
+    ordered = sorted(latencies)
+    return {
+        "logins_per_s": logins / elapsed,
+        "p50": statistics.median(ordered),
+        "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+    }
+
+
+async def main(logins: int, workers: int) -> None:
+    print(f"{logins} concurrent logins, {workers} KDF workers")
+    for scheme, cost, hasher in CONFIGS:
+        try:
+            result = await _bench(hasher, logins, workers)
+        except ImportError as e:
+            print(f"{scheme:<7} {cost or '':<10} skipped ({e})")
+            continue
+        print(
+            f"{scheme:<7} {cost or '':<10} logins/s={result['logins_per_s']:10.1f}  "
+            f"p50={result['p50']:8.2f}ms  p99={result['p99']:8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_HASH_WORKERS)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.workers))
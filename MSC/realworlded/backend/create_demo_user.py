@@ -1,13 +1,7 @@
 """Script to create demo user account"""
 from app.db.database import SessionLocal
 from app.models.models import User
-from passlib.context import CryptContext
-
-# Create password context directly
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+from app.core.security import get_password_hash
 
 def create_demo_user():
     db = SessionLocal()
@@ -1,12 +1,21 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 import logging
 
+from app.core import metrics, timing
 from app.core.config import settings
 from app.api.v1.api import api_router
-from app.db.database import engine, Base
+from app.db.database import async_engine
+from app.db.migrations import run_migrations
+from app.agents import llm, resilience
+from app.core import passwords
+from app.agents.providers import close_providers
+from app.agents.response_cache import response_cache
+from app.services.evaluation import job_queue
+from app.services.scenarios import pool as scenario_pool
+from app.services.turns import turn_writer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,11 +27,22 @@ async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
     # Startup
     logger.info("Starting up RealWorldEd API...")
-    Base.metadata.create_all(bind=engine)
+    run_migrations()
     logger.info("Database tables created successfully")
+    await job_queue.start()
+    if settings.TURN_WRITE_BEHIND:
+        await turn_writer.start()
     yield
     # Shutdown
     logger.info("Shutting down RealWorldEd API...")
+    await job_queue.stop()
+    await turn_writer.stop()
+    await scenario_pool.close()
+    await close_providers()
+    llm.shutdown()
+    response_cache.close()
+    passwords.shutdown()
+    await async_engine.dispose()
 
 
 # Initialize FastAPI app
@@ -41,6 +61,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(timing.TimingMiddleware)
 
 
 # Exception handlers
@@ -69,12 +91,24 @@ async def root():
     }
 
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    payload, content_type = metrics.render()
+    return Response(content=payload, media_type=content_type)
+
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "RealWorldEd API"}
 
 
+@app.get("/health/llm")
+async def llm_health_check():
+    return resilience.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -54,6 +54,36 @@ export const sessionsAPI = {
 // Chat API
 export const chatAPI = {
   sendMessage: (data) => api.post('/chat/', data),
+  // Streams the reply over SSE; calls onEvent(event, data) for each
+  // `token`, `done` or `error` event as it arrives.
+  streamMessage: async (data, onEvent) => {
+    const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Authorization: `Bearer ${localStorage.getItem('token')}`,
+      },
+      body: JSON.stringify(data),
+    })
+    if (!response.ok) {
+      throw new Error(`Chat stream failed with status ${response.status}`)
+    }
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    while (true) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+      const frames = buffer.split('\n\n')
+      buffer = frames.pop()
+      for (const frame of frames) {
+        const event = frame.match(/^event: (.*)$/m)?.[1]
+        const payload = frame.match(/^data: (.*)$/m)?.[1]
+        if (event && payload) onEvent(event, JSON.parse(payload))
+      }
+    }
+  },
   getMessages: (sessionId) => api.get(`/chat/${sessionId}/messages`),
   generateScenario: (sessionId) => api.post(`/chat/scenario/${sessionId}`),
 }
@@ -61,6 +91,8 @@ export const chatAPI = {
 // Evaluation API
 export const evaluationAPI = {
   evaluate: (data) => api.post('/evaluation/', data),
+  createJob: (data) => api.post('/evaluation/jobs', data),
+  getJob: (jobId) => api.get(`/evaluation/jobs/${jobId}`),
   getReports: () => api.get('/evaluation/reports'),
   getReport: (id) => api.get(`/evaluation/reports/${id}`),
   getSessionReport: (sessionId) => api.get(`/evaluation/session/${sessionId}/report`),